@@ -0,0 +1,36 @@
+#
+# OtterTune - reward.py
+#
+# Copyright (c) 2017-18, Carnegie Mellon University Database Group
+#
+
+import numpy as np
+
+
+def compute_reward(objective, base_objective, prev_objective, less_is_better, simple=True):
+    # Computes the DDPG reward of the newest objective value relative to the
+    # objectives of the first (base) and previous results in the session.
+    # The arguments are scalars so no temporary numpy arrays are created, but
+    # a zero objective still gives inf/nan (as numpy would) instead of raising.
+    with np.errstate(divide='ignore', invalid='ignore'):
+        objective = np.float64(objective)
+        base_objective = np.float64(base_objective)
+        if simple:
+            reward = objective / base_objective
+            return float(-reward if less_is_better else reward)
+
+        prev_objective = np.float64(prev_objective)
+        base_delta = objective / base_objective
+        base_delta = base_delta * base_delta - 1
+        base_flip = (2 * base_objective - objective) / base_objective
+        base_flip = base_flip * base_flip - 1
+        if less_is_better:
+            if objective - base_objective <= 0:  # positive reward
+                reward = base_flip * abs(2 * prev_objective - objective) / prev_objective
+            else:  # negative reward
+                reward = -base_delta * objective / prev_objective
+        elif objective - base_objective > 0:  # positive reward
+            reward = base_delta * objective / prev_objective
+        else:  # negative reward
+            reward = -base_flip * abs(2 * prev_objective - objective) / prev_objective
+        return float(reward)
@@ -97,7 +97,8 @@ class GPRNP(object):
         K_inv = np.linalg.inv(K)
         self.K = K
         self.K_inv = K_inv
-        self.y_best = np.min(y_train)
+        # Each column of y_train is a separate output sharing the same kernel
+        self.y_best = np.min(y_train, axis=0)
         return self
 
     def predict(self, X_test):
@@ -109,9 +110,12 @@ class GPRNP(object):
         test_size = X_test.shape[0]
         arr_offset = 0
         length_scale = self.length_scale
-        yhats = np.zeros([test_size, 1])
+        n_outputs = self.y_train.shape[1]
+        # K_inv * y_train is the same for every batch and every output column
+        K_inv_y = np.matmul(self.K_inv, self.y_train)
+        yhats = np.zeros([test_size, n_outputs])
         sigmas = np.zeros([test_size, 1])
-        eips = np.zeros([test_size, 1])
+        eips = np.zeros([test_size, n_outputs])
         while arr_offset < test_size:
             if arr_offset + self.batch_size_ > test_size:
                 end_offset = test_size
@@ -119,15 +123,18 @@ class GPRNP(object):
                 end_offset = arr_offset + self.batch_size_
             xt_ = X_test[arr_offset:end_offset]
             K2 = self.magnitude * np.exp(-ed(self.X_train, xt_) / length_scale)
-            K3 = self.magnitude * np.exp(-ed(xt_, xt_) / length_scale)
             K2_trans = np.transpose(K2)
-            yhat = np.matmul(K2_trans, np.matmul(self.K_inv, self.y_train))
-            xt_size = K3.shape[0]
+            yhat = np.matmul(K2_trans, K_inv_y)
+            xt_size = xt_.shape[0]
             ridge = self.ridge
             if np.isscalar(ridge):
                 ridge = np.ones(xt_size) * ridge
-            sigma = np.sqrt(np.diag(K3 - np.matmul(K2_trans, np.matmul(self.K_inv, K2))
-                                    + np.diag(ridge))).reshape(xt_.shape[0], 1)
+            # Only the diagonal of the test covariance is needed: the kernel of
+            # each test point with itself is the magnitude, and the diagonal of
+            # K2' * K_inv * K2 is the column-wise dot product of K2 and K_inv * K2
+            sigma = np.sqrt(self.magnitude
+                            - np.einsum('ij,ij->j', K2, np.matmul(self.K_inv, K2))
+                            + ridge).reshape(xt_size, 1)
             u = (self.y_best - yhat) / sigma
             phi1 = 0.5 * special.erf(u / np.sqrt(2.0)) + 0.5
             phi2 = (1.0 / np.sqrt(2.0 * np.pi)) * np.exp(np.square(u) * (-0.5))
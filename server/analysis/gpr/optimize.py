@@ -67,10 +67,9 @@ def tf_optimize(model, Xnew_arr, learning_rate=0.01, maxiter=100, ucb_beta=3.,
         session.run(init_op)
         for i in range(maxiter):
             session.run(train_op)
-        Xnew_value = session.run(Xnew_bounded)
-        y_mean_value = session.run(y_mean)
-        y_std_value = session.run(y_std)
-        loss_value = session.run(loss)
+        # Fetch all of the results at once so the shared predictive ops only run once
+        Xnew_value, y_mean_value, y_std_value, loss_value = session.run(
+            [Xnew_bounded, y_mean, y_std, loss])
         assert_all_finite(Xnew_value)
         assert_all_finite(y_mean_value)
         assert_all_finite(y_std_value)
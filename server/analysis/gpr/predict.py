@@ -6,8 +6,8 @@
 # Author: Dana Van Aken
 
 import tensorflow as tf
+from gpflow import settings
 from sklearn.utils import assert_all_finite, check_array
-from sklearn.utils.validation import FLOAT_DTYPES
 
 
 class GPRResult():
@@ -18,7 +18,7 @@ class GPRResult():
 
 
 def gpflow_predict(model, Xin):
-    Xin = check_array(Xin, copy=False, warn_on_dtype=True, dtype=FLOAT_DTYPES)
+    Xin = check_array(Xin, copy=False, dtype=settings.float_type)
     fmean, fvar, _, _, _ = model._build_predict(Xin)  # pylint: disable=protected-access
     y_mean_var = model.likelihood.predict_mean_and_var(fmean, fvar)
     y_mean = y_mean_var[0]
@@ -27,8 +27,8 @@ def gpflow_predict(model, Xin):
 
     session = model.enquire_session(session=None)
     with session.as_default():
-        y_mean_value = session.run(y_mean)
-        y_std_value = session.run(y_std)
+        # Fetch both at once so the shared predictive ops only run once
+        y_mean_value, y_std_value = session.run([y_mean, y_std])
         assert_all_finite(y_mean_value)
         assert_all_finite(y_std_value)
         return GPRResult(y_mean_value, y_std_value)
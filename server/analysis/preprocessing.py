@@ -66,17 +66,15 @@ class Bin(Preprocess):
             res = bin_by_decile(matrix, self.deciles_,
                                 self.bin_start_, self.axis_)
         elif self.axis_ == 0:  # Transform columns
-            columns = []
-            for col, decile in zip(matrix.T, self.deciles_):
-                columns.append(bin_by_decile(col, decile,
-                                             self.bin_start_, axis=None))
-            res = np.vstack(columns).T
+            res = np.empty_like(matrix)
+            for i, (col, decile) in enumerate(zip(matrix.T, self.deciles_)):
+                res[:, i] = bin_by_decile(col, decile,
+                                          self.bin_start_, axis=None)
         elif self.axis_ == 1:  # Transform rows
-            rows = []
-            for row, decile in zip(matrix, self.deciles_):
-                rows.append(bin_by_decile(row, decile,
-                                          self.bin_start_, axis=None))
-            res = np.vstack(rows)
+            res = np.empty_like(matrix)
+            for i, (row, decile) in enumerate(zip(matrix, self.deciles_)):
+                res[i] = bin_by_decile(row, decile,
+                                       self.bin_start_, axis=None)
         assert res.shape == matrix.shape
         return res
 
@@ -9,6 +9,7 @@ import unittest
 import numpy as np
 import torch
 from analysis.ddpg.ddpg import DDPG
+from analysis.ddpg.reward import compute_reward
 
 
 # test ddpg model:
@@ -48,5 +49,28 @@ class TestDDPG(unittest.TestCase):
         self.assertGreater(total_reward / 500, 0.5)
 
 
+class TestReward(unittest.TestCase):
+
+    def test_simple_reward(self):
+        self.assertAlmostEqual(compute_reward(6.0, 4.0, 5.0, less_is_better=False), 1.5)
+        self.assertAlmostEqual(compute_reward(6.0, 4.0, 5.0, less_is_better=True), -1.5)
+
+    def test_reward_more_is_better(self):
+        # Improved over the base objective
+        self.assertAlmostEqual(compute_reward(6.0, 4.0, 5.0, False, simple=False), 1.5)
+        # Worse than the base objective
+        self.assertAlmostEqual(compute_reward(2.0, 4.0, 5.0, False, simple=False), -2.0)
+
+    def test_reward_less_is_better(self):
+        # Improved over the base objective
+        self.assertAlmostEqual(compute_reward(2.0, 4.0, 5.0, True, simple=False), 2.0)
+        # Worse than the base objective
+        self.assertAlmostEqual(compute_reward(6.0, 4.0, 5.0, True, simple=False), -1.5)
+
+    def test_reward_zero_objective(self):
+        self.assertEqual(compute_reward(6.0, 0.0, 5.0, less_is_better=False), float('inf'))
+        self.assertTrue(np.isnan(compute_reward(0.0, 0.0, 0.0, False, simple=False)))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -27,6 +27,7 @@ class TestGPRNP(unittest.TestCase):
         X_train = data[0:500]
         X_test = data[500:]
         y_train = boston['target'][0:500].reshape(500, 1)
+        cls.X_test = X_test
         cls.model = GPRNP(length_scale=1.0, magnitude=1.0)
         cls.model.fit(X_train, y_train, ridge=1.0)
         cls.gpr_result = cls.model.predict(X_test)
@@ -41,6 +42,18 @@ class TestGPRNP(unittest.TestCase):
         expected_sigmas = [1.4142, 1.4142, 1.4142, 1.4142, 1.4142, 1.4142]
         self.assertEqual(sigmas_round, expected_sigmas)
 
+    def test_multi_output(self):
+        # Each output column is predicted as if it was fit on its own
+        y_multi = np.hstack([self.model.y_train, 2 * self.model.y_train])
+        model = GPRNP(length_scale=1.0, magnitude=1.0)
+        model.fit(self.model.X_train, y_multi, ridge=1.0)
+        gpr_result = model.predict(self.X_test)
+        self.assertEqual(gpr_result.ypreds.shape, (self.X_test.shape[0], 2))
+        np.testing.assert_allclose(gpr_result.ypreds[:, [0]], self.gpr_result.ypreds, rtol=1e-4)
+        np.testing.assert_allclose(gpr_result.ypreds[:, [1]], 2 * self.gpr_result.ypreds,
+                                   rtol=1e-4)
+        np.testing.assert_allclose(gpr_result.sigmas, self.gpr_result.sigmas)
+
 
 # test Tensorflow version GPR
 class TestGPRTF(unittest.TestCase):
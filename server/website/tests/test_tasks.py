@@ -4,16 +4,32 @@
 # Copyright (c) 2017-18, Carnegie Mellon University Database Group
 #
 import copy
+import queue
+import mock
 import numpy as np
+from sklearn.preprocessing import StandardScaler
 from django.test import TestCase, override_settings
 from django.db import transaction
+from analysis.ddpg.prioritized_replay_memory import PrioritizedReplayMemory
 from website.models import (Workload, PipelineRun, PipelineData, Project,
-                            Result, Session, DBMSCatalog, Hardware)
+                            Result, Session, DBMSCatalog, Hardware, SessionKnob,
+                            SessionLHSSample)
+from website.set_default_knobs import set_default_knobs
 from website.tasks.periodic_tasks import (run_background_tasks,
                                           aggregate_data,
                                           run_workload_characterization,
                                           run_knob_identification)
-from website.types import PipelineTaskType, WorkloadStatusType
+from website.tasks import async_tasks
+from website.tasks.async_tasks import (aggregate_target_results, cache_ddpg_replay_memory,
+                                       gen_lhs_samples, gen_random_data, get_metric_bounds,
+                                       get_pipeline_data_map, get_recommendation_ddpg,
+                                       get_top_config_idxs, lhs_maximin,
+                                       load_ddpg_replay_memory, normalize_metric_data,
+                                       pop_lhs_sample, standardize)
+from website.types import AlgorithmType, PipelineTaskType, VarType, WorkloadStatusType
+from website.utils import JSONUtil
+
+from .utils import TEST_BASIC_SESSION_ID
 
 CELERY_TEST_RUNNER = 'djcelery.contrib.test_runner.CeleryTestSuiteRunner'
 
@@ -189,3 +205,297 @@ class RankedKnobTestCase(TestCase):
                                                workloads[0].dbms)
         for k in ranked_knobs:
             self.assertIn(k, knob_data['columnlabels'])
+
+
+class LHSTestCase(TestCase):
+
+    def testLatinHypercube(self):
+        nsamples = 10
+        samples = lhs_maximin(nfeats=3, nsamples=nsamples, random_state=0)
+        self.assertEqual(samples.shape, (nsamples, 3))
+        # Each feature has exactly one sample in each of the nsamples strata
+        strata = np.sort(np.floor(samples * nsamples), axis=0)
+        for col in strata.T:
+            self.assertEqual(col.tolist(), list(range(nsamples)))
+
+    def testRandomState(self):
+        samples1 = lhs_maximin(nfeats=4, nsamples=5, random_state=42)
+        samples2 = lhs_maximin(nfeats=4, nsamples=5, random_state=42)
+        self.assertTrue(np.array_equal(samples1, samples2))
+
+    def testLargeIntegerKnob(self):
+        maxval = 2 ** 64 - 1
+        knobs = [{'name': 'large_int', 'vartype': VarType.INTEGER,
+                  'minval': '4096', 'maxval': str(maxval)},
+                 {'name': 'real', 'vartype': VarType.REAL, 'minval': '0', 'maxval': '1'}]
+        samples = gen_lhs_samples(knobs, 10)
+        self.assertEqual(len(samples), 10)
+        for sample in samples:
+            self.assertIsInstance(sample['large_int'], int)
+            self.assertGreaterEqual(sample['large_int'], 4096)
+            self.assertLessEqual(sample['large_int'], maxval)
+            self.assertIsInstance(sample['real'], float)
+
+    def testFloatFormattedMaxval(self):
+        knobs = [{'name': 'int_knob', 'vartype': VarType.INTEGER,
+                  'minval': '0', 'maxval': '1000.0'},
+                 {'name': 'exp_knob', 'vartype': VarType.INTEGER,
+                  'minval': '0', 'maxval': '1e6'}]
+        samples = gen_lhs_samples(knobs, 10)
+        self.assertEqual(len(samples), 10)
+        for sample in samples:
+            self.assertIsInstance(sample['int_knob'], int)
+            self.assertTrue(0 <= sample['int_knob'] <= 1000)
+            self.assertIsInstance(sample['exp_knob'], int)
+            self.assertTrue(0 <= sample['exp_knob'] <= 1000000)
+
+
+class RandomDataTestCase(TestCase):
+
+    def testLargeIntegerKnob(self):
+        maxval = 2 ** 64 - 1
+        knobs = [{'name': 'large_int', 'vartype': VarType.INTEGER,
+                  'minval': '4096', 'maxval': str(maxval)}]
+        for _ in range(100):
+            value = gen_random_data(knobs)['large_int']
+            self.assertIsInstance(value, int)
+            self.assertGreaterEqual(value, 4096)
+            self.assertLessEqual(value, maxval)
+
+
+class MetricBoundsTestCase(TestCase):
+
+    def testConstantMetric(self):
+        session = Session(ddpg_metric_bounds=None)
+        metric_data = np.array([3.0, 5.0])
+        lower, upper = get_metric_bounds(metric_data, session)
+        self.assertTrue(np.array_equal(lower, metric_data))
+        self.assertTrue(np.array_equal(upper, metric_data))
+        # A metric with a zero range is mapped to 0 instead of nan
+        normalized = normalize_metric_data(metric_data, lower, upper)
+        self.assertEqual(normalized.tolist(), [0.0, 0.0])
+
+        lower = np.array([1.0, 5.0])
+        upper = np.array([5.0, 5.0])
+        normalized = normalize_metric_data(metric_data, lower, upper)
+        self.assertEqual(normalized.tolist(), [0.5, 0.0])
+
+    def testStoredBounds(self):
+        session = Session(ddpg_metric_bounds=JSONUtil.dumps([[0.0, 10.0], [4.0, 20.0]]))
+        lower, upper = get_metric_bounds(np.array([2.0, 30.0]), session)
+        self.assertEqual(lower.tolist(), [0.0, 10.0])
+        self.assertEqual(upper.tolist(), [4.0, 30.0])
+
+    def testStoredBoundsShapeMismatch(self):
+        # Bounds saved for a different number of metrics are ignored
+        session = Session(ddpg_metric_bounds=JSONUtil.dumps([[0.0], [4.0]]))
+        metric_data = np.array([2.0, 30.0])
+        lower, upper = get_metric_bounds(metric_data, session)
+        self.assertTrue(np.array_equal(lower, metric_data))
+        self.assertTrue(np.array_equal(upper, metric_data))
+
+
+class StandardizeTestCase(TestCase):
+
+    def testMatchesStandardScaler(self):
+        rng = np.random.RandomState(0)
+        matrix = rng.rand(20, 4) * 100
+        # Zero-variance column
+        matrix[:, 2] = 7.0
+        expected = StandardScaler().fit_transform(matrix)
+        actual = standardize(matrix)
+        self.assertTrue(np.allclose(actual, expected))
+        self.assertEqual(actual[:, 2].tolist(), [0.0] * 20)
+
+
+class LHSSampleQueueTestCase(TestCase):
+
+    fixtures = ['test_website.json']
+
+    def setUp(self):
+        self.session = Session.objects.get(pk=TEST_BASIC_SESSION_ID)
+        self.session.tuning_session = 'lhs'
+        self.session.save()
+        set_default_knobs(self.session)
+        self.result = Result.objects.filter(session=self.session).first()
+
+    def testBulkCreateOnEmptyQueue(self):
+        self.assertFalse(SessionLHSSample.objects.filter(session=self.session).exists())
+        agg_data, _ = aggregate_target_results(self.result.pk, AlgorithmType.GPR)
+        # One of the 100 generated samples is returned and the rest are queued
+        self.assertEqual(SessionLHSSample.objects.filter(session=self.session).count(), 99)
+        knob_names = {knob['name'] for knob in
+                      SessionKnob.objects.get_knobs_for_session(self.session)}
+        self.assertEqual(set(agg_data['config_recommend']), knob_names)
+
+    def testPopOneSamplePerCall(self):
+        aggregate_target_results(self.result.pk, AlgorithmType.GPR)
+        queued = list(SessionLHSSample.objects.filter(session=self.session).order_by('idx'))
+        for i, lhs_sample in enumerate(queued[:3]):
+            agg_data, _ = aggregate_target_results(self.result.pk, AlgorithmType.GPR)
+            self.assertEqual(agg_data['config_recommend'], JSONUtil.loads(lhs_sample.data))
+            self.assertEqual(SessionLHSSample.objects.filter(session=self.session).count(),
+                             len(queued) - i - 1)
+
+    def testPopLHSSample(self):
+        SessionLHSSample.objects.bulk_create([
+            SessionLHSSample(session=self.session, idx=i, data=JSONUtil.dumps({'knob': i}))
+            for i in range(2)])
+        self.assertEqual(pop_lhs_sample(self.session), {'knob': 0})
+        self.assertEqual(pop_lhs_sample(self.session), {'knob': 1})
+        self.assertIsNone(pop_lhs_sample(self.session))
+
+
+@mock.patch('website.tasks.async_tasks.DDPG', side_effect=lambda **kwargs: mock.Mock())
+class DDPGCacheTestCase(TestCase):
+    # pylint: disable=protected-access
+
+    params = {
+        'DDPG_ACTOR_HIDDEN_SIZES': [128, 128, 64],
+        'DDPG_CRITIC_HIDDEN_SIZES': [64, 128, 64],
+        'DDPG_USE_DEFAULT': False,
+    }
+
+    def setUp(self):
+        async_tasks._DDPG_CACHE.clear()
+
+    @staticmethod
+    def get_session(pk, actor=b'actor', critic=b'critic'):
+        return Session(pk=pk, ddpg_actor_model=actor, ddpg_critic_model=critic)
+
+    def testReuseModel(self, ddpg_class):
+        session = self.get_session(1)
+        ddpg = get_recommendation_ddpg(session, 4, 3, self.params)
+        ddpg.set_model.assert_called_once_with(b'actor', b'critic')
+        # Same saved model, so the cached one is reused without reloading it
+        self.assertIs(get_recommendation_ddpg(session, 4, 3, self.params), ddpg)
+        self.assertEqual(ddpg_class.call_count, 1)
+        self.assertEqual(ddpg.set_model.call_count, 1)
+        ddpg.noise.reset.assert_called_once_with()
+
+    def testInvalidateModel(self, ddpg_class):
+        ddpg = get_recommendation_ddpg(self.get_session(1), 4, 3, self.params)
+        # A newly saved model is loaded into the cached DDPG
+        session = self.get_session(1, actor=b'new_actor')
+        self.assertIs(get_recommendation_ddpg(session, 4, 3, self.params), ddpg)
+        self.assertEqual(ddpg_class.call_count, 1)
+        ddpg.set_model.assert_called_with(b'new_actor', b'critic')
+        # A different network shape requires a new DDPG
+        new_ddpg = get_recommendation_ddpg(session, 5, 3, self.params)
+        self.assertIsNot(new_ddpg, ddpg)
+        self.assertEqual(ddpg_class.call_count, 2)
+        new_ddpg.set_model.assert_called_once_with(b'new_actor', b'critic')
+
+    def testEviction(self, ddpg_class):
+        for pk in range(1, async_tasks._DDPG_CACHE_SIZE + 1):
+            get_recommendation_ddpg(self.get_session(pk), 4, 3, self.params)
+        # Using the first session again makes the second one the least recent
+        get_recommendation_ddpg(self.get_session(1), 4, 3, self.params)
+        get_recommendation_ddpg(self.get_session(100), 4, 3, self.params)
+        self.assertEqual(len(async_tasks._DDPG_CACHE), async_tasks._DDPG_CACHE_SIZE)
+        self.assertIn(1, async_tasks._DDPG_CACHE)
+        self.assertNotIn(2, async_tasks._DDPG_CACHE)
+        self.assertIn(100, async_tasks._DDPG_CACHE)
+        self.assertEqual(ddpg_class.call_count, async_tasks._DDPG_CACHE_SIZE + 1)
+
+
+class DDPGReplayMemoryCacheTestCase(TestCase):
+    # pylint: disable=protected-access
+
+    def setUp(self):
+        async_tasks._DDPG_MEMORY_CACHE.clear()
+
+    @staticmethod
+    def save_memory(session, samples):
+        replay_memory = PrioritizedReplayMemory(capacity=8)
+        for sample in samples:
+            replay_memory.add(1.0, sample)
+        session.ddpg_reply_memory = replay_memory.get()
+        cache_ddpg_replay_memory(session, replay_memory)
+        return replay_memory
+
+    def testReuseMemory(self):
+        session = Session(pk=1)
+        saved_memory = self.save_memory(session, [1, 2])
+        replay_memory = PrioritizedReplayMemory(capacity=8)
+        load_ddpg_replay_memory(session, replay_memory)
+        self.assertIs(replay_memory.tree, saved_memory.tree)
+
+    def testInvalidateMemory(self):
+        session = Session(pk=1)
+        saved_memory = self.save_memory(session, [1, 2])
+        # Another worker saved a newer replay memory for the session
+        other_memory = PrioritizedReplayMemory(capacity=8)
+        for sample in [1, 2, 3]:
+            other_memory.add(1.0, sample)
+        session.ddpg_reply_memory = other_memory.get()
+        replay_memory = PrioritizedReplayMemory(capacity=8)
+        load_ddpg_replay_memory(session, replay_memory)
+        self.assertIsNot(replay_memory.tree, saved_memory.tree)
+        self.assertEqual(len(replay_memory), 3)
+
+    def testEviction(self):
+        sessions = [Session(pk=pk) for pk in range(1, async_tasks._DDPG_CACHE_SIZE + 2)]
+        for session in sessions:
+            self.save_memory(session, [session.pk])
+        self.assertEqual(len(async_tasks._DDPG_MEMORY_CACHE), async_tasks._DDPG_CACHE_SIZE)
+        self.assertNotIn(sessions[0].pk, async_tasks._DDPG_MEMORY_CACHE)
+        # The evicted session's memory is still loaded from the saved blob
+        replay_memory = PrioritizedReplayMemory(capacity=8)
+        load_ddpg_replay_memory(sessions[0], replay_memory)
+        self.assertEqual(len(replay_memory), 1)
+
+
+class TopConfigTestCase(TestCase):
+
+    @staticmethod
+    def priority_queue_idxs(objectives, top_num_config):
+        q = queue.PriorityQueue()
+        for idx, objective in enumerate(objectives):
+            q.put((objective, idx))
+        idxs = []
+        while len(idxs) < top_num_config and not q.empty():
+            idxs.append(q.get_nowait()[1])
+        return idxs
+
+    def testMatchesPriorityQueue(self):
+        rng = np.random.RandomState(0)
+        # Few distinct values so that there are ties, including at the cutoff
+        objectives = rng.randint(0, 5, size=50).astype(float)
+        for top_num_config in (0, 1, 10, 23, 50, 60):
+            self.assertEqual(get_top_config_idxs(objectives, top_num_config).tolist(),
+                             self.priority_queue_idxs(objectives, top_num_config))
+
+
+class PipelineDataCacheTestCase(TestCase):
+    # pylint: disable=protected-access
+
+    fixtures = ['test_website.json']
+
+    def setUp(self):
+        async_tasks._PIPELINE_DATA_CACHE.clear()
+        self.pipeline_data = PipelineData.objects.filter(pipeline_run=1)
+
+    def testParsedData(self):
+        data_map = get_pipeline_data_map(1, self.pipeline_data)
+        self.assertEqual(len(data_map), self.pipeline_data.count())
+        for entry in self.pipeline_data:
+            parsed = data_map[(entry.workload_id, entry.task_type)]
+            expected = JSONUtil.loads(entry.data)
+            if entry.task_type in (PipelineTaskType.KNOB_DATA, PipelineTaskType.METRIC_DATA):
+                self.assertIsInstance(parsed['data'], np.ndarray)
+                self.assertFalse(parsed['data'].flags.writeable)
+                self.assertTrue(np.array_equal(parsed['data'], expected['data']))
+                self.assertEqual(parsed['columnlabels'], expected['columnlabels'])
+            else:
+                self.assertEqual(parsed, expected)
+        # Cached entries are returned without parsing them again
+        cached_map = get_pipeline_data_map(1, self.pipeline_data)
+        for key, parsed in data_map.items():
+            self.assertIs(cached_map[key], parsed)
+
+    def testEviction(self):
+        with mock.patch.object(async_tasks, '_PIPELINE_DATA_CACHE_SIZE', 3):
+            data_map = get_pipeline_data_map(1, self.pipeline_data)
+        self.assertEqual(len(data_map), self.pipeline_data.count())
+        self.assertEqual(len(async_tasks._PIPELINE_DATA_CACHE), 3)
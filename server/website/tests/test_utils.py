@@ -12,7 +12,7 @@ from django.test import TestCase
 
 from website.utils import JSONUtil, MediaUtil, DataUtil, ConversionUtil, LabelUtil, TaskUtil
 from website.types import LabelStyleType, VarType
-from website.models import Result, DBMSCatalog
+from website.models import Result, DBMSCatalog, Session
 
 
 class JSONUtilTest(TestCase):
@@ -220,6 +220,26 @@ class DataUtilTest(TestCase):
             self.assertTrue(i in test_y_matrix)
             rowys.add(tuple(i))
 
+    def test_knob_bounds(self):
+        session = Session.objects.get(pk=1)
+        knob_labels = ['global.bgwriter_delay', 'global.wal_sync_method']
+        bounds = DataUtil.get_knob_bounds(knob_labels, session)
+        self.assertEqual(bounds.shape, (2, len(knob_labels)))
+        self.assertEqual(bounds[:, 0].tolist(), [10, 10000])
+        self.assertEqual(bounds[:, 1].tolist(), [0, 3])
+
+    def test_row_view(self):
+        X_workload = np.array([[1.0, 2.0], [3.0, 4.0], [5.0, 6.0]])
+        X_target = np.array([[3, 4], [7, 8], [1, 2]])
+
+        row_dtype = np.result_type(X_workload, X_target)
+        workload_rows = DataUtil.get_row_view(X_workload, row_dtype)
+        target_rows = DataUtil.get_row_view(X_target, row_dtype)
+
+        self.assertEqual(workload_rows.shape, (3,))
+        self.assertEqual(target_rows.shape, (3,))
+        self.assertEqual(np.isin(workload_rows, target_rows).tolist(), [True, True, False])
+
     def test_no_featured_categorical(self):
         featured_knobs = ['global.backend_flush_after',
                           'global.bgwriter_delay',
@@ -15,6 +15,9 @@ from django.test import TestCase
 
 from .utils import (TEST_BASIC_SESSION_ID, TEST_PASSWORD, TEST_PROJECT_ID, TEST_USERNAME)
 from website.db import target_objectives
+from website.models import Session, SessionLHSSample
+from website.set_default_knobs import set_default_knobs
+from website.utils import JSONUtil
 
 
 class UserAuthViewTests(TestCase):
@@ -223,6 +226,44 @@ class SessionViewsTests(TestCase):
         response = self.client.post(form_addr, post_data, follow=True)
         self.assertEqual(response.status_code, 204)
 
+    def test_edit_knob_clears_lhs_samples(self):
+        session = Session.objects.get(pk=TEST_BASIC_SESSION_ID)
+        session.tuning_session = 'lhs'
+        session.save()
+        SessionLHSSample.objects.create(session=session, idx=0, data='{}')
+        form_addr = reverse('edit_knobs', kwargs={'project_id': TEST_PROJECT_ID,
+                                                  'session_id': TEST_BASIC_SESSION_ID})
+        post_data = {
+            'name': 'global.wal_writer_delay',
+            'minval': '1',
+            'maxval': '1000',
+            'tunable': 'on'
+        }
+        response = self.client.post(form_addr, post_data, follow=True)
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(SessionLHSSample.objects.filter(session=session).exists())
+
+    def test_backdoor_edit_session_knobs_clears_lhs_samples(self):
+        session = Session.objects.get(pk=TEST_BASIC_SESSION_ID)
+        session.tuning_session = 'lhs'
+        session.save()
+        set_default_knobs(session)
+        SessionLHSSample.objects.create(session=session, idx=0, data='{}')
+        post_data = {
+            'username': TEST_USERNAME,
+            'password': TEST_PASSWORD,
+            'project_name': session.project.name,
+            'name': session.name,
+            'dbms_type': 'postgres',
+            'dbms_version': session.dbms.version,
+            'session_knobs': JSONUtil.dumps({
+                'global.shared_buffers': {'minval': '128', 'maxval': '1024', 'tunable': True},
+            }),
+        }
+        response = self.client.post(reverse('backdoor_edit_session'), post_data)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(SessionLHSSample.objects.filter(session=session).exists())
+
     def test_delete_zero_sessions(self):
         form_addr = reverse('delete_session', kwargs={'project_id': TEST_PROJECT_ID})
         post_data = {'sessions': []}
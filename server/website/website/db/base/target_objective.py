@@ -73,6 +73,7 @@ class TargetObjectives:
     def __init__(self):
         self._registry = {}
         self._metric_metadatas = {}
+        self._metric_metadata_cache = {}
         self._default_target_objective = THROUGHPUT
 
     def register(self):
@@ -107,10 +108,15 @@ class TargetObjectives:
         if not self.registered():
             self.register()
         dbms_id = int(dbms_id)
-        metadata = list(self._metric_metadatas[dbms_id])
-        target_objective_instance = self._registry[dbms_id][target_objective]
-        metadata.insert(0, (target_objective, target_objective_instance))
-        return OrderedDict(metadata)
+        key = (dbms_id, target_objective)
+        if key not in self._metric_metadata_cache:
+            # The metadata never changes once registered so it is built once and
+            # shared by all callers (which must not modify it)
+            metadata = list(self._metric_metadatas[dbms_id])
+            target_objective_instance = self._registry[dbms_id][target_objective]
+            metadata.insert(0, (target_objective, target_objective_instance))
+            self._metric_metadata_cache[key] = OrderedDict(metadata)
+        return self._metric_metadata_cache[key]
 
     def default(self):
         return self._default_target_objective
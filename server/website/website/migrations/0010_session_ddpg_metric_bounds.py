@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.27 on 2026-10-15 12:00
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0009_change_executiontime_function_field'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='session',
+            name='ddpg_metric_bounds',
+            field=models.TextField(blank=True, null=True),
+        ),
+    ]
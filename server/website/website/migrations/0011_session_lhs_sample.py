@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.27 on 2026-10-15 12:30
+from __future__ import unicode_literals
+
+import json
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def move_lhs_samples(apps, schema_editor):
+    Session = apps.get_model("website", "Session")
+    SessionLHSSample = apps.get_model("website", "SessionLHSSample")
+    for session in Session.objects.exclude(lhs_samples="[]"):
+        samples = json.loads(session.lhs_samples)
+        SessionLHSSample.objects.bulk_create([
+            SessionLHSSample(session=session, idx=i, data=json.dumps(sample))
+            for i, sample in enumerate(samples)])
+        session.lhs_samples = "[]"
+        session.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0010_session_ddpg_metric_bounds'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SessionLHSSample',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('idx', models.IntegerField()),
+                ('data', models.TextField()),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='website.Session')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='sessionlhssample',
+            unique_together=set([('session', 'idx')]),
+        ),
+        migrations.RunPython(move_lhs_samples, migrations.RunPython.noop),
+    ]
@@ -152,6 +152,7 @@ class Session(BaseModel):
     ddpg_actor_model = models.BinaryField(null=True, blank=True)
     ddpg_critic_model = models.BinaryField(null=True, blank=True)
     ddpg_reply_memory = models.BinaryField(null=True, blank=True)
+    ddpg_metric_bounds = models.TextField(null=True, blank=True)
     dnn_model = models.BinaryField(null=True, blank=True)
 
     project = models.ForeignKey(Project)
@@ -188,6 +189,7 @@ class Session(BaseModel):
     "GPR_DEBUG": true,
     "GPR_EPS": 0.001,
     "GPR_EPSILON": 1e-06,
+    "GPR_FP32": false,
     "GPR_LEARNING_RATE": 0.01,
     "GPR_LENGTH_SCALE": 2.0,
     "GPR_MAGNITUDE": 1.0,
@@ -202,6 +204,7 @@ class Session(BaseModel):
     "GPR_UCB_SCALE": 0.2,
     "GPR_USE_GPFLOW": true,
     "GPR_UCB_BETA": "get_beta_td",
+    "GPR_XLA_JIT": false,
     "IMPORTANT_KNOB_NUMBER": 10000,
     "INIT_FLIP_PROB": 0.3,
     "NUM_SAMPLES": 30,
@@ -299,6 +302,16 @@ class SessionKnob(BaseModel):
     tunable = models.BooleanField(verbose_name="tunable")
 
 
+class SessionLHSSample(models.Model):
+    # A pre-generated LHS config that has not been recommended to the session yet
+    session = models.ForeignKey(Session)
+    idx = models.IntegerField()
+    data = models.TextField()
+
+    class Meta:  # pylint: disable=no-init
+        unique_together = ('session', 'idx')
+
+
 class DataModel(BaseModel):
     session = models.ForeignKey(Session)
     name = models.CharField(max_length=50)
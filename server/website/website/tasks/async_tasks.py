@@ -3,23 +3,30 @@
 #
 # Copyright (c) 2017-18, Carnegie Mellon University Database Group
 #
+import contextlib
+import copy
+import hashlib
+import logging
 import random
-import queue
 import time
+from collections import OrderedDict
+from decimal import Decimal
+from functools import lru_cache, reduce
 import numpy as np
 import tensorflow as tf
 import gpflow
-from pyDOE import lhs
-from scipy.stats import uniform
+from scipy.spatial.distance import pdist
 from pytz import timezone
 
 from celery import shared_task, Task
 from celery.utils.log import get_task_logger
 from djcelery.models import TaskMeta
 from sklearn.preprocessing import StandardScaler, MinMaxScaler
+from sklearn.utils import check_random_state
 
 from django.utils.datetime_safe import datetime
 from analysis.ddpg.ddpg import DDPG
+from analysis.ddpg.reward import compute_reward
 from analysis.gp import GPRNP
 from analysis.gp_tf import GPRGD
 from analysis.nn_tf import NeuralNet
@@ -29,8 +36,8 @@ from analysis.gpr.optimize import tf_optimize
 from analysis.gpr.predict import gpflow_predict
 from analysis.preprocessing import Bin, DummyEncoder
 from analysis.constraints import ParamConstraintHelper
-from website.models import (PipelineData, PipelineRun, Result, Workload, SessionKnob,
-                            MetricCatalog, ExecutionTime)
+from website.models import (PipelineData, PipelineRun, Result, Session, Workload, SessionKnob,
+                            SessionLHSSample, MetricCatalog, ExecutionTime)
 from website import db
 from website.types import PipelineTaskType, AlgorithmType, VarType
 from website.utils import DataUtil, JSONUtil
@@ -39,6 +46,37 @@ from website.settings import ENABLE_DUMMY_ENCODER, TIME_ZONE
 
 LOG = get_task_logger(__name__)
 
+# Number of sessions whose DDPG models and replay memories are kept in memory
+# by each worker
+_DDPG_CACHE_SIZE = 4
+
+# DDPG models used for configuration recommendations, cached by session id
+# together with the digest of the saved model they were loaded from
+_DDPG_CACHE = OrderedDict()
+
+# Replay memory trees of the DDPG models last trained by this worker, cached by
+# session id together with the digest of the replay memory saved for the session
+_DDPG_MEMORY_CACHE = OrderedDict()
+
+# Number of parsed pipeline data entries kept in memory by each worker
+_PIPELINE_DATA_CACHE_SIZE = 256
+
+# Parsed pipeline data, keyed by (pipeline run id, workload id, task type)
+_PIPELINE_DATA_CACHE = OrderedDict()
+
+
+def _blob_digest(*blobs):
+    return tuple(hashlib.sha1(bytes(blob)).digest() for blob in blobs)
+
+
+def _lru_put(cache, key, value, maxsize):
+    # Inserts into an OrderedDict used as an LRU cache and evicts the least
+    # recently used entries beyond maxsize
+    cache[key] = value
+    cache.move_to_end(key)
+    while len(cache) > maxsize:
+        cache.popitem(last=False)
+
 
 class BaseTask(Task):  # pylint: disable=abstract-method
     abstract = True
@@ -104,35 +142,31 @@ def clean_knob_data(knob_matrix, knob_labels, session):
              len(set(knob_labels) - set(knob_cat)))
 
     nrows = knob_matrix.shape[0]  # pylint: disable=unsubscriptable-object
-    new_labels = []
-    new_columns = []
+    new_labels = list(knob_cat)
+    label_idxs = {label: i for i, label in enumerate(knob_labels)}
+    col_idxs = np.array([label_idxs.get(knob_name, -1) for knob_name in knob_cat], dtype=int)
+    missing = col_idxs < 0
 
-    for knob in session_knobs:
-        knob_name = knob['name']
-        if knob_name not in knob_labels:
-            # Add missing column initialized to knob's default value
-            default_val = knob['default']
-            try:
-                if knob['vartype'] == VarType.ENUM:
-                    default_val = knob['enumvals'].split(',').index(default_val)
-                elif knob['vartype'] == VarType.BOOL:
-                    default_val = str(default_val).lower() in ("on", "true", "yes", "0")
-                else:
-                    default_val = float(default_val)
-            except ValueError:
-                default_val = 0
-                LOG.exception("Error parsing knob default: %s=%s", knob_name, default_val)
-            new_col = np.ones((nrows, 1), dtype=float) * default_val
-            new_lab = knob_name
-        else:
-            index = knob_labels.index(knob_name)
-            new_col = knob_matrix[:, index]
-            new_lab = knob_labels[index]
+    new_matrix = np.empty((nrows, len(knob_cat)), dtype=float)
+    new_matrix[:, ~missing] = np.take(knob_matrix, col_idxs[~missing], axis=1)
 
-        new_labels.append(new_lab)
-        new_columns.append(new_col)
+    for i in np.flatnonzero(missing):
+        # Add missing column initialized to knob's default value
+        knob = session_knobs[i]
+        knob_name = knob['name']
+        default_val = knob['default']
+        try:
+            if knob['vartype'] == VarType.ENUM:
+                default_val = knob['enumvals'].split(',').index(default_val)
+            elif knob['vartype'] == VarType.BOOL:
+                default_val = str(default_val).lower() in ("on", "true", "yes", "0")
+            else:
+                default_val = float(default_val)
+        except ValueError:
+            default_val = 0
+            LOG.exception("Error parsing knob default: %s=%s", knob_name, default_val)
+        new_matrix[:, i] = default_val
 
-    new_matrix = np.hstack(new_columns).reshape(nrows, -1)
     LOG.debug("Cleaned matrix: %s, knobs (%s): %s", new_matrix.shape,
               len(new_labels), new_labels)
 
@@ -156,20 +190,87 @@ def clean_metric_data(metric_matrix, metric_labels, session):
     unused_columns = set(metric_labels) - set(metric_cat)
     LOG.debug("clean_metric_data added %d metrics and removed %d metric.", len(missing_columns),
               len(unused_columns))
-    default_val = 0
+    metric_matrix = np.asarray(metric_matrix)
     metric_cat_size = len(metric_cat)
-    matrix = np.ones((len(metric_matrix), metric_cat_size)) * default_val
+    matrix = np.zeros((len(metric_matrix), metric_cat_size), dtype=metric_matrix.dtype)
     metric_labels_dict = {n: i for i, n in enumerate(metric_labels)}
     # column labels in matrix has the same order as ones in metric catalog
-    # missing values are filled with default_val
-    for i, metric_name in enumerate(metric_cat):
-        if metric_name in metric_labels_dict:
-            index = metric_labels_dict[metric_name]
-            matrix[:, i] = metric_matrix[:, index]
+    # missing values are filled with zeros
+    col_idxs = np.array([metric_labels_dict.get(n, -1) for n in metric_cat], dtype=int)
+    found = col_idxs >= 0
+    matrix[:, found] = metric_matrix[:, col_idxs[found]]
     LOG.debug(matrix.shape)
     return matrix, metric_cat
 
 
+@lru_cache(maxsize=128)
+def _fit_knob_bounds_scaler(session_id, knob_labels,
+                            knob_ranges):  # pylint: disable=unused-argument
+    # The session's knob ranges are only passed as part of the cache key so
+    # that the scaler is refit whenever they are modified
+    session = Session.objects.get(pk=session_id)
+    return MinMaxScaler().fit(DataUtil.get_knob_bounds(knob_labels, session))
+
+
+def get_knob_bounds_scaler(knob_labels, session):
+    # Returns a min/max scaler fit to the bounds of the given knobs. The fitted
+    # scaler is cached by the worker since the bounds rarely change.
+    knob_ranges = tuple(SessionKnob.objects.filter(session=session, tunable=True).order_by(
+        'knob_id').values_list('knob_id', 'minval', 'maxval'))
+    return _fit_knob_bounds_scaler(session.pk, tuple(knob_labels), knob_ranges)
+
+
+def get_metric_bounds(metric_data, session):
+    # Returns the min/max value of each metric observed so far in the session,
+    # including the given metric data
+    lower = metric_data
+    upper = metric_data
+    if session.ddpg_metric_bounds:
+        bounds = np.array(JSONUtil.loads(session.ddpg_metric_bounds))
+        if bounds.shape == (2, len(metric_data)):
+            lower = np.minimum(bounds[0], metric_data)
+            upper = np.maximum(bounds[1], metric_data)
+    return lower, upper
+
+
+def normalize_metric_data(metric_data, lower, upper):
+    # Scales each metric to [0, 1] using the bounds observed in the session
+    data_range = upper - lower
+    return (metric_data - lower) / np.where(data_range > 0, data_range, 1.0)
+
+
+@lru_cache(maxsize=256)
+def parse_hyperparameters(session_id, hyperparameters):  # pylint: disable=unused-argument
+    # The parsed hyperparameters are shared by all tasks of the session running
+    # in this worker, so callers must not modify them
+    return JSONUtil.loads(hyperparameters)
+
+
+def gpflow_float_settings(params):
+    # GPflow builds its models with float32 tensors instead of float64 ones
+    # while these settings are active if the session enables GPR_FP32. Older
+    # sessions' hyperparameters do not include the option. It only applies to
+    # the GPflow models, the numpy and tensorflow GPR models always use float64.
+    if not params.get('GPR_FP32', False):
+        # Leave GPflow's global settings alone
+        return contextlib.ExitStack()
+    custom_settings = gpflow.settings.get_settings()
+    custom_settings.dtypes.float_type = np.float32
+    return gpflow.settings.temp_settings(custom_settings)
+
+
+def reset_gpflow_session(xla_jit=False):
+    # Resets the default graph and GPflow session. The session lets the GPU be
+    # shared with other processes and compiles the graph with XLA JIT if asked.
+    tf.reset_default_graph()
+    graph = tf.get_default_graph()
+    config = tf.ConfigProto(**gpflow.settings.session)
+    config.gpu_options.allow_growth = True
+    if xla_jit:
+        config.graph_options.optimizer_options.global_jit_level = tf.OptimizerOptions.ON_1
+    gpflow.reset_default_session(graph=graph, config=config)
+
+
 def save_execution_time(start_ts, fn, result):
     end_ts = time.time()
     exec_time = end_ts - start_ts
@@ -178,50 +279,67 @@ def save_execution_time(start_ts, fn, result):
                                  start_time=start_time, execution_time=exec_time, result=result)
 
 
+def pop_lhs_sample(session):
+    # Removes and returns the session's next pre-generated LHS config, or None
+    # if there are none left. Concurrent tasks can read the same row, so only
+    # the task whose delete actually removed it gets the config.
+    while True:
+        lhs_sample = SessionLHSSample.objects.filter(session=session).order_by('idx').first()
+        if lhs_sample is None:
+            return None
+        deleted, _ = SessionLHSSample.objects.filter(pk=lhs_sample.pk).delete()
+        if deleted:
+            return JSONUtil.loads(lhs_sample.data)
+
+
 @shared_task(base=IgnoreResultTask, name='aggregate_target_results')
 def aggregate_target_results(result_id, algorithm):
     start_ts = time.time()
     # Check that we've completed the background tasks at least once. We need
     # this data in order to make a configuration recommendation (until we
     # implement a sampling technique to generate new training data).
-    newest_result = Result.objects.get(pk=result_id)
+    newest_result = Result.objects.select_related(
+        'session', 'dbms', 'workload', 'knob_data', 'metric_data').get(pk=result_id)
     has_pipeline_data = PipelineData.objects.filter(workload=newest_result.workload).exists()
     if not has_pipeline_data or newest_result.session.tuning_session == 'lhs':
         if not has_pipeline_data and newest_result.session.tuning_session == 'tuning_session':
             LOG.debug("Background tasks haven't ran for this workload yet, picking data with lhs.")
 
-        all_samples = JSONUtil.loads(newest_result.session.lhs_samples)
-        if len(all_samples) == 0:
-            knobs = SessionKnob.objects.get_knobs_for_session(newest_result.session)
-            if newest_result.session.tuning_session == 'lhs':
+        session = newest_result.session
+        samples = pop_lhs_sample(session)
+        if samples is None:
+            knobs = SessionKnob.objects.get_knobs_for_session(session)
+            if session.tuning_session == 'lhs':
                 all_samples = gen_lhs_samples(knobs, 100)
             else:
                 all_samples = gen_lhs_samples(knobs, 10)
-            LOG.debug('%s: Generated LHS.\n\ndata=%s\n',
-                      AlgorithmType.name(algorithm), JSONUtil.dumps(all_samples[:5], pprint=True))
-        samples = all_samples.pop()
-        result = Result.objects.filter(pk=result_id)
-        agg_data = DataUtil.aggregate_data(result)
+            if LOG.isEnabledFor(logging.DEBUG):
+                LOG.debug('%s: Generated LHS.\n\ndata=%s\n', AlgorithmType.name(algorithm),
+                          JSONUtil.dumps(all_samples[:5], pprint=True))
+            samples = all_samples.pop()
+            SessionLHSSample.objects.bulk_create([
+                SessionLHSSample(session=session, idx=i, data=JSONUtil.dumps(sample))
+                for i, sample in enumerate(all_samples)])
+        agg_data = DataUtil.aggregate_data([newest_result])
         agg_data['newest_result_id'] = result_id
         agg_data['bad'] = True
         agg_data['config_recommend'] = samples
-        newest_result.session.lhs_samples = JSONUtil.dumps(all_samples)
-        newest_result.session.save()
-        LOG.debug('%s: Got LHS config.\n\ndata=%s\n',
-                  AlgorithmType.name(algorithm), JSONUtil.dumps(agg_data, pprint=True))
+        if LOG.isEnabledFor(logging.DEBUG):
+            LOG.debug('%s: Got LHS config.\n\ndata=%s\n',
+                      AlgorithmType.name(algorithm), JSONUtil.dumps(agg_data, pprint=True))
 
     elif newest_result.session.tuning_session == 'randomly_generate':
-        result = Result.objects.filter(pk=result_id)
         knobs = SessionKnob.objects.get_knobs_for_session(newest_result.session)
 
         # generate a config randomly
         random_knob_result = gen_random_data(knobs)
-        agg_data = DataUtil.aggregate_data(result)
+        agg_data = DataUtil.aggregate_data([newest_result])
         agg_data['newest_result_id'] = result_id
         agg_data['bad'] = True
         agg_data['config_recommend'] = random_knob_result
-        LOG.debug('%s: Finished generating a random config.\n\ndata=%s\n',
-                  AlgorithmType.name(algorithm), JSONUtil.dumps(agg_data, pprint=True))
+        if LOG.isEnabledFor(logging.DEBUG):
+            LOG.debug('%s: Finished generating a random config.\n\ndata=%s\n',
+                      AlgorithmType.name(algorithm), JSONUtil.dumps(agg_data, pprint=True))
 
     else:
         # Aggregate all knob config results tried by the target so far in this
@@ -244,39 +362,73 @@ def aggregate_target_results(result_id, algorithm):
 
         LOG.debug('%s: Finished aggregating target results.\n\n',
                   AlgorithmType.name(algorithm))
-    save_execution_time(start_ts, "aggregate_target_results", Result.objects.get(pk=result_id))
+    save_execution_time(start_ts, "aggregate_target_results", newest_result)
     return agg_data, algorithm
 
 
 def gen_random_data(knobs):
-    random_knob_result = {}
+    names = []
+    types = []
+    minvals = []
+    maxvals = []
     for knob in knobs:
-        name = knob["name"]
-        if knob["vartype"] == VarType.BOOL:
-            flag = random.randint(0, 1)
-            if flag == 0:
-                random_knob_result[name] = False
-            else:
-                random_knob_result[name] = True
-        elif knob["vartype"] == VarType.ENUM:
-            enumvals = knob["enumvals"].split(',')
-            enumvals_len = len(enumvals)
-            rand_idx = random.randint(0, enumvals_len - 1)
-            random_knob_result[name] = rand_idx
-        elif knob["vartype"] == VarType.INTEGER:
-            random_knob_result[name] = random.randint(int(knob["minval"]), int(knob["maxval"]))
-        elif knob["vartype"] == VarType.REAL:
-            random_knob_result[name] = random.uniform(
-                float(knob["minval"]), float(knob["maxval"]))
-        elif knob["vartype"] == VarType.STRING:
-            random_knob_result[name] = "None"
-        elif knob["vartype"] == VarType.TIMESTAMP:
-            random_knob_result[name] = "None"
+        vartype = knob["vartype"]
+        if vartype == VarType.BOOL:
+            minval, maxval = 0, 1
+        elif vartype == VarType.ENUM:
+            minval, maxval = 0, len(knob["enumvals"].split(',')) - 1
+        elif vartype == VarType.INTEGER:
+            minval, maxval = int(knob["minval"]), int(knob["maxval"])
+        elif vartype == VarType.REAL:
+            minval, maxval = float(knob["minval"]), float(knob["maxval"])
+        elif vartype in (VarType.STRING, VarType.TIMESTAMP):
+            minval, maxval = 0, 0
         else:
             raise Exception(
-                'Unknown variable type: {}'.format(knob["vartype"]))
-
-    return random_knob_result
+                'Unknown variable type: {}'.format(vartype))
+        names.append(knob["name"])
+        types.append(vartype)
+        minvals.append(minval)
+        maxvals.append(maxval)
+
+    # Draw all knob values at once: reals are uniform in [minval, maxval] and
+    # the integer-like types are uniform over {minval, ..., maxval}
+    samples = np.random.rand(len(names))
+    int_idx = [i for i, vartype in enumerate(types) if vartype == VarType.INTEGER]
+    types = np.array(types, dtype=int)
+    real_mask = types == VarType.REAL
+    enum_mask = types == VarType.ENUM
+    bool_mask = types == VarType.BOOL
+    str_mask = ~(real_mask | enum_mask | bool_mask | (types == VarType.INTEGER))
+    float_minvals = np.array(minvals, dtype=float)
+    scales = np.array(maxvals, dtype=float) - float_minvals
+
+    values = np.empty(len(names), dtype=object)
+    values[real_mask] = float_minvals[real_mask] + samples[real_mask] * scales[real_mask]
+    values[enum_mask] = (float_minvals[enum_mask] + np.floor(
+        samples[enum_mask] * (scales[enum_mask] + 1))).astype(int)
+    values[bool_mask] = samples[bool_mask] < 0.5
+    values[str_mask] = "None"
+    # Integer knobs can range up to 2**64 - 1 so they are computed with python
+    # ints, the min() guards against the float product rounding up to maxval + 1
+    for i in int_idx:
+        values[i] = min(minvals[i] + int(samples[i] * (maxvals[i] - minvals[i] + 1)),
+                        maxvals[i])
+
+    return dict(zip(names, values.tolist()))
+
+
+def lhs_maximin(nfeats, nsamples, ndesigns=100, random_state=None):
+    # Generates candidate latin hypercube designs (one random permutation of the
+    # strata per feature plus uniform jitter within each stratum) and returns the
+    # design that maximizes the minimum distance between any two of its samples
+    rng = check_random_state(random_state)
+    perms = np.argsort(rng.rand(ndesigns, nsamples, nfeats), axis=1)
+    designs = (perms + rng.rand(ndesigns, nsamples, nfeats)) / nsamples
+    if nsamples < 2:
+        return designs[0]
+    min_dists = [pdist(design).min() for design in designs]
+    return designs[np.argmax(min_dists)]
 
 
 def gen_lhs_samples(knobs, nsamples):
@@ -292,75 +444,107 @@ def gen_lhs_samples(knobs, nsamples):
         types.append(knob['vartype'])
 
     nfeats = len(knobs)
-    samples = lhs(nfeats, samples=nsamples, criterion='maximin')
+    samples = lhs_maximin(nfeats, nsamples)
     maxvals = np.array(maxvals)
     minvals = np.array(minvals)
-    scales = maxvals - minvals
-    for fidx in range(nfeats):
-        samples[:, fidx] = uniform(loc=minvals[fidx], scale=scales[fidx]).ppf(samples[:, fidx])
-    lhs_samples = []
-    for sidx in range(nsamples):
-        lhs_samples.append(dict())
-        for fidx in range(nfeats):
-            if types[fidx] == VarType.INTEGER:
-                lhs_samples[-1][names[fidx]] = int(round(samples[sidx][fidx]))
-            elif types[fidx] == VarType.BOOL:
-                lhs_samples[-1][names[fidx]] = int(round(samples[sidx][fidx]))
-            elif types[fidx] == VarType.ENUM:
-                lhs_samples[-1][names[fidx]] = int(round(samples[sidx][fidx]))
-            elif types[fidx] == VarType.REAL:
-                lhs_samples[-1][names[fidx]] = float(samples[sidx][fidx])
-            else:
-                LOG.debug("LHS type not supported: %s", types[fidx])
+    # The inverse CDF of uniform(minval, maxval) is just a linear rescale
+    samples *= maxvals - minvals
+    samples += minvals
+
+    types = np.array(types)
+    int_mask = np.isin(types, (VarType.INTEGER, VarType.BOOL, VarType.ENUM))
+    keep_mask = int_mask | (types == VarType.REAL)
+    for vartype in set(types[~keep_mask].tolist()):
+        LOG.debug("LHS type not supported: %s", vartype)
+
+    # Integer-like columns are rounded and converted to python ints, the
+    # others are kept as python floats. Integer knobs can range beyond int64 so
+    # the values are converted one by one and clamped to the exact maxval that
+    # the float rescale may round past
+    int_maxvals = [int(Decimal(knob['maxval']))
+                   for knob, is_int in zip(knobs, int_mask) if is_int]
+    samples = samples[:, keep_mask]
+    int_mask = int_mask[keep_mask]
+    values = samples.astype(object)
+    values[:, int_mask] = [[min(int(v), maxval) for v, maxval in zip(row, int_maxvals)]
+                           for row in np.rint(samples[:, int_mask]).tolist()]
+    names = [name for name, keep in zip(names, keep_mask) if keep]
+    lhs_samples = [dict(zip(names, row)) for row in values.tolist()]
     random.shuffle(lhs_samples)
 
     return lhs_samples
 
 
+def load_ddpg_replay_memory(session, replay_memory):
+    # Loads the replay memory saved for the session. The tree cached by this
+    # worker is only reused if nothing else has saved a new one since then.
+    memory_digest, memory_tree = _DDPG_MEMORY_CACHE.pop(session.pk, (None, None))
+    if session.ddpg_reply_memory:
+        if memory_digest == _blob_digest(session.ddpg_reply_memory):
+            replay_memory.tree = memory_tree
+        else:
+            replay_memory.set(session.ddpg_reply_memory)
+
+
+def cache_ddpg_replay_memory(session, replay_memory):
+    # Caches the tree of the replay memory just saved for the session
+    _lru_put(_DDPG_MEMORY_CACHE, session.pk,
+             (_blob_digest(session.ddpg_reply_memory), replay_memory.tree),
+             _DDPG_CACHE_SIZE)
+
+
 @shared_task(base=IgnoreResultTask, name='train_ddpg')
 def train_ddpg(result_id):
     start_ts = time.time()
     LOG.info('Add training data to ddpg and train ddpg')
-    result = Result.objects.get(pk=result_id)
-    session = Result.objects.get(pk=result_id).session
-    params = JSONUtil.loads(session.hyperparameters)
-    session_results = Result.objects.filter(session=session,
-                                            creation_time__lt=result.creation_time)
+    result = Result.objects.select_related(
+        'session', 'knob_data', 'metric_data').get(pk=result_id)
+    session = result.session
+    params = parse_hyperparameters(session.pk, session.hyperparameters)
+    session_result_ids = list(Result.objects.filter(
+        session=session, creation_time__lt=result.creation_time).order_by(
+            'creation_time').values_list('pk', flat=True))
     result_info = {}
     result_info['newest_result_id'] = result_id
 
-    # Extract data from result and previous results
-    result = Result.objects.filter(pk=result_id)
-    if len(session_results) == 0:
-        base_result_id = result_id
-        prev_result_id = result_id
+    # Extract data from result and previous results. The simple reward only
+    # compares against the base result, so the previous one is not needed
+    agg_data = DataUtil.aggregate_data([result])
+    if len(session_result_ids) == 0:
+        base_metric_data = agg_data['y_matrix'].flatten()
+        prev_metric_data = base_metric_data
     else:
-        base_result_id = session_results[0].pk
-        prev_result_id = session_results[len(session_results) - 1].pk
-    base_result = Result.objects.filter(pk=base_result_id)
-    prev_result = Result.objects.filter(pk=prev_result_id)
-
-    agg_data = DataUtil.aggregate_data(result)
-    base_metric_data = (DataUtil.aggregate_data(base_result))['y_matrix'].flatten()
-    prev_metric_data = (DataUtil.aggregate_data(prev_result))['y_matrix'].flatten()
+        base_result_id = session_result_ids[0]
+        prev_result_id = session_result_ids[-1]
+        if params['DDPG_SIMPLE_REWARD']:
+            fetch_ids = [base_result_id]
+        else:
+            fetch_ids = [base_result_id, prev_result_id]
+        session_results = Result.objects.select_related(
+            'knob_data', 'metric_data').in_bulk(fetch_ids)
+        base_metric_data = (DataUtil.aggregate_data(
+            [session_results[base_result_id]]))['y_matrix'].flatten()
+        if params['DDPG_SIMPLE_REWARD']:
+            prev_metric_data = None
+        else:
+            prev_metric_data = (DataUtil.aggregate_data(
+                [session_results[prev_result_id]]))['y_matrix'].flatten()
 
-    result = Result.objects.get(pk=result_id)
-    target_objective = result.session.target_objective
+    target_objective = session.target_objective
     prev_obj_idx = [i for i, n in enumerate(agg_data['y_columnlabels']) if n == target_objective]
 
     # Clean metric data
     metric_data, metric_labels = clean_metric_data(agg_data['y_matrix'],
                                                    agg_data['y_columnlabels'], session)
     metric_data = metric_data.flatten()
-    metric_scalar = MinMaxScaler().fit(metric_data.reshape(1, -1))
-    normalized_metric_data = metric_scalar.transform(metric_data.reshape(1, -1))[0]
+    metric_lower, metric_upper = get_metric_bounds(metric_data, session)
+    normalized_metric_data = normalize_metric_data(metric_data, metric_lower, metric_upper)
 
     # Clean knob data
     cleaned_knob_data = clean_knob_data(agg_data['X_matrix'], agg_data['X_columnlabels'], session)
     knob_data = np.array(cleaned_knob_data[0])
     knob_labels = np.array(cleaned_knob_data[1])
-    knob_bounds = np.vstack(DataUtil.get_knob_bounds(knob_labels.flatten(), session))
-    knob_data = MinMaxScaler().fit(knob_bounds).transform(knob_data)[0]
+    knob_data = get_knob_bounds_scaler(knob_labels.flatten(), session).transform(knob_data)[0]
     knob_num = len(knob_data)
     metric_num = len(metric_data)
     LOG.info('knob_num: %d, metric_num: %d', knob_num, metric_num)
@@ -374,32 +558,18 @@ def train_ddpg(result_id):
         raise Exception(('Found {} instances of target objective in '
                          'metrics (target_obj={})').format(len(target_obj_idx),
                                                            target_objective))
-    objective = metric_data[target_obj_idx]
-    base_objective = base_metric_data[prev_obj_idx]
-    prev_objective = prev_metric_data[prev_obj_idx]
-    metric_meta = db.target_objectives.get_metric_metadata(
-        result.session.dbms.pk, result.session.target_objective)
+    objective = float(metric_data[target_obj_idx[0]])
+    base_objective = float(base_metric_data[prev_obj_idx[0]])
+    if prev_metric_data is None:
+        prev_objective = None
+    else:
+        prev_objective = float(prev_metric_data[prev_obj_idx[0]])
+    metric_meta = db.target_objectives.get_metric_metadata(session.dbms_id, target_objective)
+    lessisbetter = metric_meta[target_objective].improvement == db.target_objectives.LESS_IS_BETTER
 
     # Calculate the reward
-    if params['DDPG_SIMPLE_REWARD']:
-        objective = objective / base_objective
-        if metric_meta[target_objective].improvement == '(less is better)':
-            reward = -objective
-        else:
-            reward = objective
-    else:
-        if metric_meta[target_objective].improvement == '(less is better)':
-            if objective - base_objective <= 0:  # positive reward
-                reward = (np.square((2 * base_objective - objective) / base_objective) - 1)\
-                    * abs(2 * prev_objective - objective) / prev_objective
-            else:  # negative reward
-                reward = -(np.square(objective / base_objective) - 1) * objective / prev_objective
-        else:
-            if objective - base_objective > 0:  # positive reward
-                reward = (np.square(objective / base_objective) - 1) * objective / prev_objective
-            else:  # negative reward
-                reward = -(np.square((2 * base_objective - objective) / base_objective) - 1)\
-                    * abs(2 * prev_objective - objective) / prev_objective
+    reward = compute_reward(objective, base_objective, prev_objective, lessisbetter,
+                            simple=params['DDPG_SIMPLE_REWARD'])
     LOG.info('reward: %f', reward)
 
     # Update ddpg
@@ -411,15 +581,21 @@ def train_ddpg(result_id):
                 use_default=params['DDPG_USE_DEFAULT'])
     if session.ddpg_actor_model and session.ddpg_critic_model:
         ddpg.set_model(session.ddpg_actor_model, session.ddpg_critic_model)
-    if session.ddpg_reply_memory:
-        ddpg.replay_memory.set(session.ddpg_reply_memory)
-    ddpg.add_sample(normalized_metric_data, knob_data, reward, normalized_metric_data)
+    load_ddpg_replay_memory(session, ddpg.replay_memory)
+    ddpg.add_sample(normalized_metric_data, knob_data, np.array([reward]),
+                    normalized_metric_data)
     for _ in range(params['DDPG_UPDATE_EPOCHS']):
         ddpg.update()
     session.ddpg_actor_model, session.ddpg_critic_model = ddpg.get_model()
     session.ddpg_reply_memory = ddpg.replay_memory.get()
-    save_execution_time(start_ts, "train_ddpg", Result.objects.get(pk=result_id))
+    session.ddpg_metric_bounds = JSONUtil.dumps([metric_lower, metric_upper])
+    save_execution_time(start_ts, "train_ddpg", result)
     session.save()
+    cache_ddpg_replay_memory(session, ddpg.replay_memory)
+    _lru_put(_DDPG_CACHE, session.pk,
+             (get_ddpg_config(knob_num, metric_num, params), ddpg,
+              _blob_digest(session.ddpg_actor_model, session.ddpg_critic_model)),
+             _DDPG_CACHE_SIZE)
     return result_info
 
 
@@ -440,6 +616,37 @@ def create_and_save_recommendation(recommended_knobs, result, status, **kwargs):
     return retval
 
 
+def get_ddpg_config(knob_num, metric_num, params):
+    # Settings that determine the shape of the DDPG networks
+    return (knob_num, metric_num, tuple(params['DDPG_ACTOR_HIDDEN_SIZES']),
+            tuple(params['DDPG_CRITIC_HIDDEN_SIZES']), params['DDPG_USE_DEFAULT'])
+
+
+def get_recommendation_ddpg(session, knob_num, metric_num, params):
+    # Reuses the DDPG model cached for the session by this worker and only
+    # reloads its weights when train_ddpg has saved a new model since then
+    config = get_ddpg_config(knob_num, metric_num, params)
+    if session.ddpg_actor_model is not None and session.ddpg_critic_model is not None:
+        model_digest = _blob_digest(session.ddpg_actor_model, session.ddpg_critic_model)
+    else:
+        model_digest = None
+
+    cached_config, ddpg, cached_digest = _DDPG_CACHE.get(session.pk, (None, None, None))
+    if ddpg is None or cached_config != config:
+        ddpg = DDPG(n_actions=knob_num, n_states=metric_num,
+                    a_hidden_sizes=params['DDPG_ACTOR_HIDDEN_SIZES'],
+                    c_hidden_sizes=params['DDPG_CRITIC_HIDDEN_SIZES'],
+                    use_default=params['DDPG_USE_DEFAULT'])
+        cached_digest = None
+    else:
+        # Start the exploration noise from scratch like a newly built model
+        ddpg.noise.reset()
+    if model_digest is not None and model_digest != cached_digest:
+        ddpg.set_model(session.ddpg_actor_model, session.ddpg_critic_model)
+    _lru_put(_DDPG_CACHE, session.pk, (config, ddpg, model_digest), _DDPG_CACHE_SIZE)
+    return ddpg
+
+
 @shared_task(base=ConfigurationRecommendation, name='configuration_recommendation_ddpg')
 def configuration_recommendation_ddpg(result_info):  # pylint: disable=invalid-name
     start_ts = time.time()
@@ -448,30 +655,23 @@ def configuration_recommendation_ddpg(result_info):  # pylint: disable=invalid-n
     result_list = Result.objects.filter(pk=result_id)
     result = result_list.first()
     session = result.session
-    params = JSONUtil.loads(session.hyperparameters)
+    params = parse_hyperparameters(session.pk, session.hyperparameters)
     agg_data = DataUtil.aggregate_data(result_list)
     metric_data, _ = clean_metric_data(agg_data['y_matrix'], agg_data['y_columnlabels'], session)
     metric_data = metric_data.flatten()
-    metric_scalar = MinMaxScaler().fit(metric_data.reshape(1, -1))
-    normalized_metric_data = metric_scalar.transform(metric_data.reshape(1, -1))[0]
+    normalized_metric_data = normalize_metric_data(
+        metric_data, *get_metric_bounds(metric_data, session))
     cleaned_knob_data = clean_knob_data(agg_data['X_matrix'], agg_data['X_columnlabels'], session)
     knob_labels = np.array(cleaned_knob_data[1]).flatten()
     knob_num = len(knob_labels)
     metric_num = len(metric_data)
 
-    ddpg = DDPG(n_actions=knob_num, n_states=metric_num,
-                a_hidden_sizes=params['DDPG_ACTOR_HIDDEN_SIZES'],
-                c_hidden_sizes=params['DDPG_CRITIC_HIDDEN_SIZES'],
-                use_default=params['DDPG_USE_DEFAULT'])
-    if session.ddpg_actor_model is not None and session.ddpg_critic_model is not None:
-        ddpg.set_model(session.ddpg_actor_model, session.ddpg_critic_model)
-    if session.ddpg_reply_memory is not None:
-        ddpg.replay_memory.set(session.ddpg_reply_memory)
+    ddpg = get_recommendation_ddpg(session, knob_num, metric_num, params)
     knob_data = ddpg.choose_action(normalized_metric_data)
 
-    knob_bounds = np.vstack(DataUtil.get_knob_bounds(knob_labels, session))
-    knob_data = MinMaxScaler().fit(knob_bounds).inverse_transform(knob_data.reshape(1, -1))[0]
-    conf_map = {k: knob_data[i] for i, k in enumerate(knob_labels)}
+    knob_scaler = get_knob_bounds_scaler(knob_labels, session)
+    knob_data = knob_scaler.inverse_transform(knob_data.reshape(1, -1))[0]
+    conf_map = dict(zip(knob_labels, knob_data.tolist()))
 
     conf_map_res = create_and_save_recommendation(recommended_knobs=conf_map, result=result,
                                                   status='good', info='INFO: ddpg')
@@ -480,11 +680,26 @@ def configuration_recommendation_ddpg(result_info):  # pylint: disable=invalid-n
     return conf_map_res
 
 
+def standardize(matrix):
+    # Scales each column to zero mean and unit variance (same as sklearn's
+    # StandardScaler, but without the overhead of building a scaler object)
+    std = matrix.std(axis=0)
+    std[std == 0.0] = 1.0
+    return (matrix - matrix.mean(axis=0)) / std
+
+
+def get_top_config_idxs(objectives, top_num_config):
+    # Returns the row indexes of the top_num_config lowest objectives in
+    # increasing order. The stable sort breaks ties by row index, the same way
+    # as popping (objective, index) pairs from a priority queue.
+    return np.argsort(objectives, kind='mergesort')[:top_num_config]
+
+
 def combine_workload(target_data):
     newest_result = Result.objects.get(pk=target_data['newest_result_id'])
     latest_pipeline_run = PipelineRun.objects.get(pk=target_data['pipeline_run'])
     session = newest_result.session
-    params = JSONUtil.loads(session.hyperparameters)
+    params = parse_hyperparameters(session.pk, session.hyperparameters)
 
     # Load mapped workload data
     if target_data['mapped_workload'] is not None:
@@ -566,11 +781,9 @@ def combine_workload(target_data):
 
     # Delete any rows that appear in both the workload data and the target
     # data from the workload data
-    dups_filter = np.ones(X_workload.shape[0], dtype=bool)
-    target_row_tups = [tuple(row) for row in X_target]
-    for i, row in enumerate(X_workload):
-        if tuple(row) in target_row_tups:
-            dups_filter[i] = False
+    row_dtype = np.result_type(X_workload, X_target)
+    dups_filter = ~np.isin(DataUtil.get_row_view(X_workload, row_dtype),
+                           DataUtil.get_row_view(X_target, row_dtype))
     X_workload = X_workload[dups_filter, :]
     y_workload = y_workload[dups_filter, :]
     rowlabels_workload = rowlabels_workload[dups_filter]
@@ -582,15 +795,20 @@ def combine_workload(target_data):
     if ENABLE_DUMMY_ENCODER:
         categorical_info = DataUtil.dummy_encoder_helper(X_columnlabels,
                                                          newest_result.dbms)
-        dummy_encoder = DummyEncoder(categorical_info['n_values'],
-                                     categorical_info['categorical_features'],
-                                     categorical_info['cat_columnlabels'],
-                                     categorical_info['noncat_columnlabels'])
-        X_matrix = dummy_encoder.fit_transform(X_matrix)
+        if len(categorical_info['n_values']) > 0:
+            dummy_encoder = DummyEncoder(categorical_info['n_values'],
+                                         categorical_info['categorical_features'],
+                                         categorical_info['cat_columnlabels'],
+                                         categorical_info['noncat_columnlabels'])
+            X_matrix = dummy_encoder.fit_transform(X_matrix)
+            total_dummies = dummy_encoder.total_dummies()
+        else:
+            # There are no categorical knobs to encode
+            dummy_encoder = None
+            total_dummies = 0
         binary_encoder = categorical_info['binary_vars']
         # below two variables are needed for correctly determing max/min on dummies
         binary_index_set = set(categorical_info['binary_vars'])
-        total_dummies = dummy_encoder.total_dummies()
     else:
         dummy_encoder = None
         binary_encoder = None
@@ -604,26 +822,16 @@ def combine_workload(target_data):
         # FIXME (dva): if there are fewer than 5 target results so far
         # then scale the y values (metrics) using the workload's
         # y_scaler. I'm not sure if 5 is the right cutoff.
-        y_target_scaler = None
-        y_workload_scaler = StandardScaler()
-        y_matrix = np.vstack([y_target, y_workload])
-        y_scaled = y_workload_scaler.fit_transform(y_matrix)
+        y_scaled = standardize(np.vstack([y_target, y_workload]))
+    elif y_workload.shape[0] == 0:
+        # All of the workload's rows were also in the target data
+        y_scaled = standardize(y_target)
     else:
         # FIXME (dva): otherwise try to compute a separate y_scaler for
         # the target and scale them separately.
-        try:
-            y_target_scaler = StandardScaler()
-            y_workload_scaler = StandardScaler()
-            y_target_scaled = y_target_scaler.fit_transform(y_target)
-            y_workload_scaled = y_workload_scaler.fit_transform(y_workload)
-            y_scaled = np.vstack([y_target_scaled, y_workload_scaled])
-        except ValueError:
-            y_target_scaler = None
-            y_workload_scaler = StandardScaler()
-            y_scaled = y_workload_scaler.fit_transform(y_target)
+        y_scaled = np.vstack([standardize(y_target), standardize(y_workload)])
 
-    metric_meta = db.target_objectives.get_metric_metadata(
-        newest_result.session.dbms.pk, newest_result.session.target_objective)
+    metric_meta = db.target_objectives.get_metric_metadata(session.dbms_id, target_objective)
     lessisbetter = metric_meta[target_objective].improvement == db.target_objectives.LESS_IS_BETTER
     # Maximize the throughput, moreisbetter
     # Use gradient descent to minimize -throughput
@@ -642,28 +850,27 @@ def combine_workload(target_data):
     # ridge[:X_target.shape[0]] = 0.01
     # ridge[X_target.shape[0]:] = 0.1
 
-    X_min = np.empty(X_scaled.shape[1])
-    X_max = np.empty(X_scaled.shape[1])
-    X_scaler_matrix = np.zeros([1, X_scaled.shape[1]])
-
     session_knobs = SessionKnob.objects.get_knobs_for_session(newest_result.session)
+    knob_bounds = {knob["name"]: (knob["minval"], knob["maxval"]) for knob in session_knobs}
 
     # Set min/max for knob values
-    for i in range(X_scaled.shape[1]):
-        if i < total_dummies or i in binary_index_set:
-            col_min = 0
-            col_max = 1
-        else:
-            col_min = X_scaled[:, i].min()
-            col_max = X_scaled[:, i].max()
-            for knob in session_knobs:
-                if X_columnlabels[i] == knob["name"]:
-                    X_scaler_matrix[0][i] = knob["minval"]
-                    col_min = X_scaler.transform(X_scaler_matrix)[0][i]
-                    X_scaler_matrix[0][i] = knob["maxval"]
-                    col_max = X_scaler.transform(X_scaler_matrix)[0][i]
-        X_min[i] = col_min
-        X_max[i] = col_max
+    X_min = X_scaled.min(axis=0)
+    X_max = X_scaled.max(axis=0)
+    binary_mask = np.zeros(X_scaled.shape[1], dtype=bool)
+    binary_mask[:total_dummies] = True
+    binary_mask[list(binary_index_set)] = True
+    bounded_idxs = np.array([i for i in np.flatnonzero(~binary_mask)
+                             if X_columnlabels[i] in knob_bounds], dtype=int)
+    bounded_minmax = np.array([knob_bounds[X_columnlabels[i]] for i in bounded_idxs],
+                              dtype=float).reshape(-1, 2)
+    # X_scaler is a StandardScaler, so scaling the session's knob bounds is
+    # simply (x - mean) / scale for each knob
+    bounded_mean = X_scaler.mean_[bounded_idxs]
+    bounded_scale = X_scaler.scale_[bounded_idxs]
+    X_min[bounded_idxs] = (bounded_minmax[:, 0] - bounded_mean) / bounded_scale
+    X_max[bounded_idxs] = (bounded_minmax[:, 1] - bounded_mean) / bounded_scale
+    X_min[binary_mask] = 0
+    X_max[binary_mask] = 1
 
     return X_columnlabels, X_scaler, X_scaled, y_scaled, X_max, X_min,\
         dummy_encoder, constraint_helper
@@ -676,7 +883,7 @@ def configuration_recommendation(recommendation_input):
     LOG.info('configuration_recommendation called')
     newest_result = Result.objects.get(pk=target_data['newest_result_id'])
     session = newest_result.session
-    params = JSONUtil.loads(session.hyperparameters)
+    params = parse_hyperparameters(session.pk, session.hyperparameters)
 
     if target_data['bad'] is True:
         if session.tuning_session == 'randomly_generate':
@@ -696,31 +903,25 @@ def configuration_recommendation(recommendation_input):
 
     # FIXME: we should generate more samples and use a smarter sampling technique
     num_samples = params['NUM_SAMPLES']
-    X_samples = np.empty((num_samples, X_scaled.shape[1]))
-    for i in range(X_scaled.shape[1]):
-        X_samples[:, i] = np.random.rand(num_samples) * (X_max[i] - X_min[i]) + X_min[i]
-
-    q = queue.PriorityQueue()
-    for x in range(0, y_scaled.shape[0]):
-        q.put((y_scaled[x][0], x))
-
-    i = 0
-    while i < params['TOP_NUM_CONFIG']:
-        try:
-            item = q.get_nowait()
-            # Tensorflow get broken if we use the training data points as
-            # starting points for GPRGD. We add a small bias for the
-            # starting points. GPR_EPS default value is 0.001
-            # if the starting point is X_max, we minus a small bias to
-            # make sure it is within the range.
-            dist = sum(np.square(X_max - X_scaled[item[1]]))
-            if dist < 0.001:
-                X_samples = np.vstack((X_samples, X_scaled[item[1]] - abs(params['GPR_EPS'])))
-            else:
-                X_samples = np.vstack((X_samples, X_scaled[item[1]] + abs(params['GPR_EPS'])))
-            i = i + 1
-        except queue.Empty:
-            break
+    top_num_config = max(min(params['TOP_NUM_CONFIG'], y_scaled.shape[0]), 0)
+    X_samples = np.empty((num_samples + top_num_config, X_scaled.shape[1]))
+    random_samples = X_samples[:num_samples]
+    np.multiply(np.random.rand(num_samples, X_scaled.shape[1]), X_max - X_min,
+                out=random_samples)
+    random_samples += X_min
+
+    # Add the configurations with the best (lowest) scaled objectives so far as
+    # starting points too, in increasing order of their objective
+    top_idxs = get_top_config_idxs(y_scaled[:, 0], top_num_config)
+    top_configs = X_scaled[top_idxs]
+    # Tensorflow get broken if we use the training data points as
+    # starting points for GPRGD. We add a small bias for the
+    # starting points. GPR_EPS default value is 0.001
+    # if the starting point is X_max, we minus a small bias to
+    # make sure it is within the range.
+    dists = np.sum(np.square(X_max - top_configs), axis=1)
+    bias = np.where(dists < 0.001, -abs(params['GPR_EPS']), abs(params['GPR_EPS']))
+    np.add(top_configs, bias[:, np.newaxis], out=X_samples[num_samples:])
 
     res = None
 
@@ -755,13 +956,14 @@ def configuration_recommendation(recommendation_input):
             opt_kwargs['debug'] = params['GPR_DEBUG']
             opt_kwargs['ucb_beta'] = ucb.get_ucb_beta(params['GPR_UCB_BETA'],
                                                       scale=params['GPR_UCB_SCALE'],
-                                                      t=i + 1., ndim=X_scaled.shape[1])
-            tf.reset_default_graph()
-            graph = tf.get_default_graph()
-            gpflow.reset_default_session(graph=graph)
-            m = gpr_models.create_model(params['GPR_MODEL_NAME'], X=X_scaled, y=y_scaled,
-                                        **model_kwargs)
-            res = tf_optimize(m.model, X_samples, **opt_kwargs)
+                                                      t=top_num_config + 1.,
+                                                      ndim=X_scaled.shape[1])
+            # Older sessions' hyperparameters do not include GPR_XLA_JIT
+            reset_gpflow_session(xla_jit=params.get('GPR_XLA_JIT', False))
+            with gpflow_float_settings(params):
+                m = gpr_models.create_model(params['GPR_MODEL_NAME'], X=X_scaled, y=y_scaled,
+                                            **model_kwargs)
+                res = tf_optimize(m.model, X_samples, **opt_kwargs)
         else:
             model = GPRGD(length_scale=params['GPR_LENGTH_SCALE'],
                           magnitude=params['GPR_MAGNITUDE'],
@@ -781,7 +983,7 @@ def configuration_recommendation(recommendation_input):
     best_config = res.minl_conf[best_config_idx, :]
     best_config = X_scaler.inverse_transform(best_config)
 
-    if ENABLE_DUMMY_ENCODER:
+    if dummy_encoder is not None:
         # Decode one-hot encoding into categorical knobs
         best_config = dummy_encoder.inverse_transform(best_config)
 
@@ -790,28 +992,61 @@ def configuration_recommendation(recommendation_input):
     # when we inversely transform the scaled data, the different becomes much larger
     # and cannot be ignored. Here we check the range on the original data
     # directly, and make sure the recommended config lies within the range
-    X_min_inv = X_scaler.inverse_transform(X_min)
-    X_max_inv = X_scaler.inverse_transform(X_max)
-    best_config = np.minimum(best_config, X_max_inv)
-    best_config = np.maximum(best_config, X_min_inv)
+    X_min_inv, X_max_inv = X_scaler.inverse_transform(np.vstack((X_min, X_max)))
+    np.clip(best_config, X_min_inv, X_max_inv, out=best_config)
 
-    conf_map = {k: best_config[i] for i, k in enumerate(X_columnlabels)}
+    conf_map = dict(zip(X_columnlabels, best_config.tolist()))
     conf_map_res = create_and_save_recommendation(
         recommended_knobs=conf_map, result=newest_result,
         status='good', info='INFO: training data size is {}'.format(X_scaled.shape[0]),
         pipeline_run=target_data['pipeline_run'])
-    LOG.debug('%s: Finished selecting the next config.\n\ndata=%s\n',
-              AlgorithmType.name(algorithm), JSONUtil.dumps(conf_map_res, pprint=True))
+    if LOG.isEnabledFor(logging.DEBUG):
+        LOG.debug('%s: Finished selecting the next config.\n\ndata=%s\n',
+                  AlgorithmType.name(algorithm), JSONUtil.dumps(conf_map_res, pprint=True))
 
     save_execution_time(start_ts, "configuration_recommendation", newest_result)
     return conf_map_res
 
 
-def load_data_helper(filtered_pipeline_data, workload, task_type):
-    pipeline_data = filtered_pipeline_data.get(workload=workload,
-                                               task_type=task_type)
-    LOG.debug("PIPELINE DATA: %s", str(pipeline_data.data))
-    return JSONUtil.loads(pipeline_data.data)
+def parse_pipeline_data(data):
+    # The knob and metric data matrices are kept as (read-only) numpy arrays
+    # since they take much less memory than the nested lists they are saved as
+    data = JSONUtil.loads(data)
+    if isinstance(data, dict) and 'data' in data:
+        data['data'] = np.array(data['data'])
+        data['data'].setflags(write=False)
+    return data
+
+
+def get_pipeline_data_map(pipeline_run_id, filtered_pipeline_data):
+    # Returns the parsed pipeline data keyed by (workload id, task type). The
+    # pipeline data does not change once it is saved so the most recently used
+    # entries are cached and only the ones missing from the cache are fetched
+    keys = set(filtered_pipeline_data.values_list('workload', 'task_type'))
+    pipeline_data_map = {}
+    for key in keys:
+        cache_key = (pipeline_run_id,) + key
+        if cache_key in _PIPELINE_DATA_CACHE:
+            _PIPELINE_DATA_CACHE.move_to_end(cache_key)
+            pipeline_data_map[key] = _PIPELINE_DATA_CACHE[cache_key]
+    missing_keys = keys.difference(pipeline_data_map)
+    if missing_keys:
+        missing_data = filtered_pipeline_data.filter(
+            workload__in={workload for workload, _ in missing_keys}).values_list(
+                'workload', 'task_type', 'data')
+        for workload, task_type, data in missing_data:
+            key = (workload, task_type)
+            if key in missing_keys:
+                LOG.debug("PIPELINE DATA: %s", data)
+                pipeline_data_map[key] = parse_pipeline_data(data)
+                _lru_put(_PIPELINE_DATA_CACHE, (pipeline_run_id,) + key,
+                         pipeline_data_map[key], _PIPELINE_DATA_CACHE_SIZE)
+    return pipeline_data_map
+
+
+def load_data_helper(pipeline_data_map, workload, task_type):
+    # The parsed data is shared with the cache so callers get a shallow copy
+    return copy.copy(pipeline_data_map[(workload, task_type)])
 
 
 @shared_task(base=MapWorkloadTask, name='map_workload')
@@ -822,8 +1057,9 @@ def map_workload(map_workload_input):
     if target_data['bad']:
         assert target_data is not None
         target_data['pipeline_run'] = None
-        LOG.debug('%s: Skipping workload mapping.\n\ndata=%s\n',
-                  AlgorithmType.name(algorithm), JSONUtil.dumps(target_data, pprint=True))
+        if LOG.isEnabledFor(logging.DEBUG):
+            LOG.debug('%s: Skipping workload mapping.\n\ndata=%s\n',
+                      AlgorithmType.name(algorithm), JSONUtil.dumps(target_data, pprint=True))
 
         return target_data, algorithm
 
@@ -834,7 +1070,7 @@ def map_workload(map_workload_input):
 
     newest_result = Result.objects.get(pk=target_data['newest_result_id'])
     session = newest_result.session
-    params = JSONUtil.loads(session.hyperparameters)
+    params = parse_hyperparameters(session.pk, session.hyperparameters)
     target_workload = newest_result.workload
     X_columnlabels = np.array(target_data['X_columnlabels'])
     y_columnlabels = np.array(target_data['y_columnlabels'])
@@ -855,25 +1091,35 @@ def map_workload(map_workload_input):
     ranked_knob_idxs = None
     pruned_metric_idxs = None
 
-    unique_workloads = pipeline_data.values_list('workload', flat=True).distinct()
+    unique_workloads = list(pipeline_data.values_list('workload', flat=True).distinct())
+
+    # Fetch the workloads, which of them have results and their pipeline data
+    # up front rather than querying for each workload in the loop below
+    workloads = Workload.objects.in_bulk(unique_workloads)
+    workloads_with_results = set(Result.objects.filter(
+        workload__in=unique_workloads).values_list('workload', flat=True).distinct())
+    pipeline_data_map = get_pipeline_data_map(latest_pipeline_run.pk, pipeline_data.filter(
+        workload__in=workloads_with_results, task_type__in=[
+            PipelineTaskType.KNOB_DATA, PipelineTaskType.METRIC_DATA,
+            PipelineTaskType.RANKED_KNOBS, PipelineTaskType.PRUNED_METRICS]))
 
     workload_data = {}
     # Compute workload mapping data for each unique workload
     for unique_workload in unique_workloads:
 
-        workload_obj = Workload.objects.get(pk=unique_workload)
-        wkld_results = Result.objects.filter(workload=workload_obj)
-        if wkld_results.exists() is False:
+        if unique_workload not in workloads_with_results:
             # delete the workload
-            workload_obj.delete()
+            workloads.pop(unique_workload).delete()
             continue
 
         # Load knob & metric data for this workload
-        knob_data = load_data_helper(pipeline_data, unique_workload, PipelineTaskType.KNOB_DATA)
+        knob_data = load_data_helper(pipeline_data_map, unique_workload,
+                                     PipelineTaskType.KNOB_DATA)
         knob_data["data"], knob_data["columnlabels"] = clean_knob_data(knob_data["data"],
                                                                        knob_data["columnlabels"],
                                                                        newest_result.session)
-        metric_data = load_data_helper(pipeline_data, unique_workload, PipelineTaskType.METRIC_DATA)
+        metric_data = load_data_helper(pipeline_data_map, unique_workload,
+                                       PipelineTaskType.METRIC_DATA)
         X_matrix = np.array(knob_data["data"])
         y_matrix = np.array(metric_data["data"])
         rowlabels = np.array(knob_data["rowlabels"])
@@ -883,10 +1129,10 @@ def map_workload(map_workload_input):
             # For now set ranked knobs & pruned metrics to be those computed
             # for the first workload
             global_ranked_knobs = load_data_helper(
-                pipeline_data, unique_workload,
+                pipeline_data_map, unique_workload,
                 PipelineTaskType.RANKED_KNOBS)[:params['IMPORTANT_KNOB_NUMBER']]
             global_pruned_metrics = load_data_helper(
-                pipeline_data, unique_workload, PipelineTaskType.PRUNED_METRICS)
+                pipeline_data_map, unique_workload, PipelineTaskType.PRUNED_METRICS)
             ranked_knob_idxs = [i for i in range(X_matrix.shape[1]) if X_columnlabels[
                 i] in global_ranked_knobs]
             pruned_metric_idxs = [i for i in range(y_matrix.shape[1]) if y_columnlabels[
@@ -918,15 +1164,30 @@ def map_workload(map_workload_input):
                   AlgorithmType.name(algorithm))
         return target_data, algorithm
 
-    # Stack all X & y matrices for preprocessing
-    Xs = np.vstack([entry['X_matrix'] for entry in list(workload_data.values())])
-    ys = np.vstack([entry['y_matrix'] for entry in list(workload_data.values())])
-
-    # Scale the X & y values, then compute the deciles for each column in y
+    # Stack all X & y matrices for preprocessing. The rows of the i-th
+    # workload are workload_offsets[i]:workload_offsets[i + 1]. Only the
+    # stacked rows are used from here on, so each workload's own matrices are
+    # released as soon as they have been copied.
+    workload_ids = list(workload_data.keys())
+    workload_offsets = np.cumsum(
+        [0] + [workload_data[w]['X_matrix'].shape[0] for w in workload_ids])
+    Xs = np.empty((workload_offsets[-1], len(ranked_knob_idxs)), dtype=reduce(
+        np.promote_types, [workload_data[w]['X_matrix'].dtype for w in workload_ids]))
+    ys = np.empty((workload_offsets[-1], len(pruned_metric_idxs)), dtype=reduce(
+        np.promote_types, [workload_data[w]['y_matrix'].dtype for w in workload_ids]))
+    for i, workload_id in enumerate(workload_ids):
+        workload_entry = workload_data.pop(workload_id)
+        Xs[workload_offsets[i]:workload_offsets[i + 1]] = workload_entry['X_matrix']
+        ys[workload_offsets[i]:workload_offsets[i + 1]] = workload_entry['y_matrix']
+    del workload_entry
+
+    # Scale the X & y values, then compute the deciles for each column in y.
+    # All of the workloads are scaled at once here and the models below use
+    # their rows of the scaled matrices.
     X_scaler = StandardScaler(copy=False)
-    X_scaler.fit(Xs)
+    Xs_scaled = X_scaler.fit_transform(Xs)
     y_scaler = StandardScaler(copy=False)
-    y_scaler.fit_transform(ys)
+    ys_scaled = y_scaler.fit_transform(ys)
     y_binner = Bin(bin_start=1, axis=0)
     y_binner.fit(ys)
     del Xs
@@ -942,60 +1203,59 @@ def map_workload(map_workload_input):
     y_target = y_scaler.transform(y_target)
     y_target = y_binner.transform(y_target)
 
+    if params['GPR_USE_GPFLOW']:
+        # All of the workloads' models are built in the same graph and session,
+        # which only have to be reset once per call
+        reset_gpflow_session()
+        model_kwargs = {'lengthscales': params['GPR_LENGTH_SCALE'],
+                        'variance': params['GPR_MAGNITUDE'],
+                        'noise_variance': params['GPR_RIDGE']}
+    else:
+        # The same numpy model is refit on each workload's data
+        model = GPRNP(length_scale=params['GPR_LENGTH_SCALE'],
+                      magnitude=params['GPR_MAGNITUDE'],
+                      max_train_size=params['GPR_MAX_TRAIN_SIZE'],
+                      batch_size=params['GPR_BATCH_SIZE'])
+
+    # Buffer for the differences between each workload's binned predictions
+    # and the target's binned metrics, reused by all of the workloads
+    diffs = np.empty_like(y_target)
     scores = {}
-    for workload_id, workload_entry in list(workload_data.items()):
-        predictions = np.empty_like(y_target)
-        X_workload = workload_entry['X_matrix']
-        X_scaled = X_scaler.transform(X_workload)
-        y_workload = workload_entry['y_matrix']
-        y_scaled = y_scaler.transform(y_workload)
-        for j, y_col in enumerate(y_scaled.T):
-            # Using this workload's data, train a Gaussian process model
-            # and then predict the performance of each metric for each of
-            # the knob configurations attempted so far by the target.
-            y_col = y_col.reshape(-1, 1)
-            if params['GPR_USE_GPFLOW']:
-                model_kwargs = {'lengthscales': params['GPR_LENGTH_SCALE'],
-                                'variance': params['GPR_MAGNITUDE'],
-                                'noise_variance': params['GPR_RIDGE']}
-                tf.reset_default_graph()
-                graph = tf.get_default_graph()
-                gpflow.reset_default_session(graph=graph)
-                m = gpr_models.create_model(params['GPR_MODEL_NAME'], X=X_scaled, y=y_col,
+    for i, workload_id in enumerate(workload_ids):
+        X_scaled = Xs_scaled[workload_offsets[i]:workload_offsets[i + 1]]
+        y_scaled = ys_scaled[workload_offsets[i]:workload_offsets[i + 1]]
+        # Using this workload's data, train a Gaussian process model with
+        # one output per metric and then predict the performance of each
+        # metric for each of the knob configurations attempted so far by the
+        # target. The kernel is shared by all of the metrics so the model is
+        # only fit once per workload.
+        if params['GPR_USE_GPFLOW']:
+            with gpflow_float_settings(params):
+                m = gpr_models.create_model(params['GPR_MODEL_NAME'], X=X_scaled, y=y_scaled,
                                             **model_kwargs)
                 gpr_result = gpflow_predict(m.model, X_target)
-            else:
-                model = GPRNP(length_scale=params['GPR_LENGTH_SCALE'],
-                              magnitude=params['GPR_MAGNITUDE'],
-                              max_train_size=params['GPR_MAX_TRAIN_SIZE'],
-                              batch_size=params['GPR_BATCH_SIZE'])
-                model.fit(X_scaled, y_col, ridge=params['GPR_RIDGE'])
-                gpr_result = model.predict(X_target)
-            predictions[:, j] = gpr_result.ypreds.ravel()
+        else:
+            model.fit(X_scaled, y_scaled, ridge=params['GPR_RIDGE'])
+            gpr_result = model.predict(X_target)
         # Bin each of the predicted metric columns by deciles and then
         # compute the score (i.e., distance) between the target workload
         # and each of the known workloads
-        predictions = y_binner.transform(predictions)
-        dists = np.sqrt(np.sum(np.square(
-            np.subtract(predictions, y_target)), axis=1))
+        predictions = y_binner.transform(gpr_result.ypreds)
+        np.subtract(predictions, y_target, out=diffs)
+        dists = np.linalg.norm(diffs, axis=1)
         scores[workload_id] = np.mean(dists)
 
     # Find the best (minimum) score
-    best_score = np.inf
-    best_workload_id = None
-    best_workload_name = None
-    scores_info = {}
-    for workload_id, similarity_score in list(scores.items()):
-        workload_name = Workload.objects.get(pk=workload_id).name
-        if similarity_score < best_score:
-            best_score = similarity_score
-            best_workload_id = workload_id
-            best_workload_name = workload_name
-        scores_info[workload_id] = (workload_name, similarity_score)
+    best_workload_id = min(scores, key=scores.get)
+    best_score = scores[best_workload_id]
+    best_workload_name = workloads[best_workload_id].name
+    scores_info = {workload_id: (workloads[workload_id].name, similarity_score)
+                   for workload_id, similarity_score in scores.items()}
     target_data.update(mapped_workload=(best_workload_id, best_workload_name, best_score),
                        scores=scores_info)
-    LOG.debug('%s: Finished mapping the workload.\n\ndata=%s\n',
-              AlgorithmType.name(algorithm), JSONUtil.dumps(target_data, pprint=True))
+    if LOG.isEnabledFor(logging.DEBUG):
+        LOG.debug('%s: Finished mapping the workload.\n\ndata=%s\n',
+                  AlgorithmType.name(algorithm), JSONUtil.dumps(target_data, pprint=True))
 
     save_execution_time(start_ts, "map_workload", newest_result)
     return target_data, algorithm
@@ -120,12 +120,19 @@ class DataUtil(object):
 
     @staticmethod
     def get_knob_bounds(knob_labels, session):
-        minvals = []
-        maxvals = []
-        for _, knob in enumerate(knob_labels):
-            knob_object = KnobCatalog.objects.get(dbms=session.dbms, name=knob, tunable=True)
-            knob_session_object = SessionKnob.objects.filter(knob=knob_object, session=session,
-                                                             tunable=True)
+        # Returns a (2, n) array with the min (row 0) and max (row 1) of each knob
+        knob_labels = list(knob_labels)
+        knob_objects = {k.name: k for k in KnobCatalog.objects.filter(
+            dbms=session.dbms, name__in=knob_labels, tunable=True)}
+        knob_session_objects = {k.knob_id: k for k in SessionKnob.objects.filter(
+            session=session, tunable=True, knob__in=list(knob_objects.values()))}
+        bounds = np.empty((2, len(knob_labels)), dtype=float)
+        for i, knob in enumerate(knob_labels):
+            knob_object = knob_objects.get(knob)
+            if knob_object is None:
+                raise KnobCatalog.DoesNotExist(
+                    "Cannot find tunable knob {} for {}".format(knob, session.dbms.full_name))
+            knob_session_object = knob_session_objects.get(knob_object.pk)
             if knob_object.vartype is VarType.ENUM:
                 enumvals = knob_object.enumvals.split(',')
                 minval = 0
@@ -133,15 +140,15 @@ class DataUtil(object):
             elif knob_object.vartype is VarType.BOOL:
                 minval = 0
                 maxval = 1
-            elif knob_session_object.exists():
-                minval = float(knob_session_object[0].minval)
-                maxval = float(knob_session_object[0].maxval)
+            elif knob_session_object is not None:
+                minval = float(knob_session_object.minval)
+                maxval = float(knob_session_object.maxval)
             else:
                 minval = float(knob_object.minval)
                 maxval = float(knob_object.maxval)
-            minvals.append(minval)
-            maxvals.append(maxval)
-        return np.array(minvals), np.array(maxvals)
+            bounds[0, i] = minval
+            bounds[1, i] = maxval
+        return bounds
 
     @staticmethod
     def aggregate_data(results):
@@ -175,14 +182,24 @@ class DataUtil(object):
             'y_columnlabels': metric_labels,
         }
 
+    @staticmethod
+    def get_row_view(matrix, dtype=None):
+        # Views each row of the 2D matrix as a single structured element with
+        # one field per column so that whole rows can be compared and sorted
+        # by numpy's set routines (e.g., isin, unique)
+        matrix = np.ascontiguousarray(matrix, dtype=dtype)
+        return matrix.view([('f{}'.format(i), matrix.dtype)
+                            for i in range(matrix.shape[1])]).ravel()
+
     @staticmethod
     def combine_duplicate_rows(X_matrix, y_matrix, rowlabels):
-        X_unique, idxs, invs, cts = np.unique(X_matrix,
-                                              return_index=True,
-                                              return_inverse=True,
-                                              return_counts=True,
-                                              axis=0)
-        num_unique = X_unique.shape[0]
+        # Finding the unique rows of the 1-D row view is much cheaper than
+        # calling np.unique with axis=0, which reshapes and copies the matrix
+        _, idxs, invs, cts = np.unique(DataUtil.get_row_view(X_matrix),
+                                       return_index=True,
+                                       return_inverse=True,
+                                       return_counts=True)
+        num_unique = idxs.shape[0]
         if num_unique == X_matrix.shape[0]:
             # No duplicate rows
 
@@ -190,18 +207,21 @@ class DataUtil(object):
             rowlabels = np.array([tuple([x]) for x in rowlabels])  # pylint: disable=bad-builtin,deprecated-lambda
             return X_matrix, y_matrix, rowlabels
 
-        # Combine duplicate rows
-        y_unique = np.empty((num_unique, y_matrix.shape[1]))
+        # Combine duplicate rows. The rows of each group are contiguous once
+        # sorted by group, so the medians of all groups with the same number
+        # of rows are computed together from a (groups, count, metrics) array
+        X_unique = np.asarray(X_matrix)[idxs]
+        order = np.argsort(invs, kind='mergesort')
+        starts = np.cumsum(cts) - cts
+        y_sorted = np.asarray(y_matrix, dtype=float)[order]
+        y_unique = np.empty((num_unique, y_sorted.shape[1]))
+        for count in np.unique(cts):
+            groups = np.flatnonzero(cts == count)
+            group_rows = starts[groups, np.newaxis] + np.arange(count)
+            y_unique[groups] = np.median(y_sorted[group_rows], axis=1)
         rowlabels_unique = np.empty(num_unique, dtype=tuple)
-        ix = np.arange(X_matrix.shape[0])
-        for i, count in enumerate(cts):
-            if count == 1:
-                y_unique[i, :] = y_matrix[idxs[i], :]
-                rowlabels_unique[i] = (rowlabels[idxs[i]],)
-            else:
-                dup_idxs = ix[invs == i]
-                y_unique[i, :] = np.median(y_matrix[dup_idxs, :], axis=0)
-                rowlabels_unique[i] = tuple(rowlabels[dup_idxs])
+        for i, dup_labels in enumerate(np.split(rowlabels[order], starts[1:])):
+            rowlabels_unique[i] = tuple(dup_labels)
         return X_unique, y_unique, rowlabels_unique
 
     @staticmethod
@@ -39,7 +39,7 @@ from .db import parser, target_objectives
 from .forms import NewResultForm, ProjectForm, SessionForm, SessionKnobForm
 from .models import (BackupData, DBMSCatalog, ExecutionTime, Hardware, KnobCatalog, KnobData,
                      MetricCatalog, MetricData, PipelineRun, Project, Result, Session,
-                     SessionKnob, User, Workload)
+                     SessionKnob, SessionLHSSample, User, Workload)
 from .tasks import (aggregate_target_results, map_workload, train_ddpg,
                     configuration_recommendation, configuration_recommendation_ddpg)
 from .types import (DBMSType, KnobUnitType, MetricType,
@@ -365,6 +365,9 @@ def edit_knobs(request, project_id, session_id):
                                                 name=form.cleaned_data["name"])
         SessionKnob.objects.filter(session=instance.session, knob=instance.knob).delete()
         instance.save()
+        # The pre-generated LHS configs are no longer valid once a knob changes
+        if session.tuning_session == 'lhs':
+            SessionLHSSample.objects.filter(session=session).delete()
         return HttpResponse(status=204)
     else:
         knobs = SessionKnob.objects.filter(session=session).prefetch_related(
@@ -1484,7 +1487,7 @@ def alt_create_or_edit_session(request):
         # Corner case: when running LHS, when the tunable knobs and/or their ranges change
         # then we must delete the pre-generated configs since they are no longer valid.
         if session_knobs and session.tuning_session == 'lhs':
-            session.lhs_samples = '[]'
+            SessionLHSSample.objects.filter(session=session).delete()
 
         session.last_update = ts
         session.save()